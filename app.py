@@ -2,9 +2,13 @@ from pathlib import Path
 import panel as pn
 
 from apps.app_PSET_change_log.app_PSET_change_log import PSET_change_log_page
+from shared.sql import engines
 
 pn.extension()
 
+# Log pool usage so POOL_SIZE / MAX_OVERFLOW can be sized against num_threads
+pn.state.schedule_task('log_pool_stats', engines.log_stats, period='10m')
+
 ROUTES = {
     "PSET_change_log_page": PSET_change_log_page,
 }
@@ -1,25 +1,65 @@
-import io
+import asyncio
+import math
 import panel as pn
-from io import BytesIO, StringIO
+from io import BytesIO
 import pandas as pd
-from collections import defaultdict
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 from config.prod import _HOST, _PORT, _UID, _PWD, _DB
-from shared.downloads import excel_format
+from shared.downloads import excel_xlsx, csv_file
 from shared.tdm_logging import logger, log_error
-from shared.sql import PGSQL
+from shared.sql import PGSQL, run_async
+from functools import partial
+
+from apps.app_PSET_change_log.change_log_cache import snapshot, count_cache, device_catalog, rev_cache
+from apps.app_PSET_change_log.change_log_listener import listener
+from apps.app_PSET_change_log.refresh import RefreshScheduler
+from apps.app_PSET_change_log.queries import (ALL_DEVICE, APPEND_REVISION_SQL, change_log_query,
+                                              change_log_page_query, change_log_count_query)
+from apps.app_PSET_change_log.formatting import (DATETIME_FORMAT, datetime_formatters, format_datetime,
+                                                 format_numbers, number_formatters, to_display_time)
 
 
 pgsql = PGSQL()
 
+# Serve the main table from the process-level latest-revision snapshot. Set to
+# False to query Postgres directly with filter_by_checkbox on every refresh.
+CHANGE_LOG_SNAPSHOT = True
+
+# "local" sends the whole filtered result to the browser and pages it there.
+# "remote" keeps only the visible page in the table and pushes paging and
+# sorting down to Postgres as LIMIT/OFFSET queries.
+TABLE_PAGINATION = "local"
+PAGE_SIZE = 50
+
+# CSV export reads the current filter from Postgres in batches of this size
+# through a server-side cursor into a spooled temporary file (see
+# shared.downloads.csv_file); FileDownload still sends the file as one base64
+# payload. CSV_EXPORT_GZIP serves a .csv.gz instead.
+CSV_EXPORT_CHUNKSIZE = 5000
+CSV_EXPORT_GZIP = False
+
+# Push new change-log rows into open sessions as Postgres NOTIFYs them
+LIVE_UPDATES = True
+
 class PSET_change_log_Backend:
     def __init__(self):
         # ======================
         # STATE
         # ======================
         self.selected_row = {"row": None}
+        self.page = 0
+        self.total_rows = 0
+        self._refresh_seq = 0
+        self._refresh_task = None
+        # The table starts empty; until a refresh has loaded it, live updates
+        # would be taken for the whole filtered result
+        self.table_loaded = False
+        self.refresh_scheduler = RefreshScheduler(
+            resolve=lambda: change_log_query(*self.current_filters()),
+            run=self.refresh_click
+        )
 
 
         # ======================
@@ -33,6 +73,15 @@ class PSET_change_log_Backend:
         self.btn_save_edit = pn.widgets.Button(name="Save", button_type="primary", width=170)
         self.btn_cancel_edit = pn.widgets.Button(name="Cancel", width=170)
 
+        # "update" edits the row clicked in the table, "batch" every checked row
+        self.edit_mode = "update"
+        self.btn_batch_edit = pn.widgets.Button(
+            name="Edit selected",
+            button_type="primary",
+            disabled=True,
+            width=170
+        )
+
         self.pop_up_edit_form = pn.layout.Modal(
             pn.Column(
                 pn.pane.Markdown("### Edit Note"),
@@ -134,34 +183,51 @@ class PSET_change_log_Backend:
                 "params": {
                     "function": "function(cell){ return String(cell.getValue()).replace(/,/g,''); }"
                 }
-            }
+            },
+            **datetime_formatters(),
+            **number_formatters()
         }
         self.table = pn.widgets.Tabulator(
             buttons={
                 "edit": '<button class="btn btn-dark btn-lg">Edit</button>',
                 "Rev0": '<button class="btn btn-secondary btn-sm">Compare Rev</button>',
             },
-            pagination="local",
+            pagination="local" if TABLE_PAGINATION == "local" else None,
             show_index=False,
             disabled=True,
-            page_size=50,
+            page_size=PAGE_SIZE,
             height=730,
             theme = 'bootstrap5',
             header_align='center',
             layout="fit_data_table",
             titles = self.title,
             text_align=text_align,
-            formatters = self.format_id
+            formatters = self.format_id,
+            selectable="checkbox"
         )
 
         self.table.on_click(self.on_table_edit_click)
 
+        # Pager for TABLE_PAGINATION = "remote"
+        self.btn_prev_page = pn.widgets.Button(name="‹ Prev", width=80)
+        self.btn_next_page = pn.widgets.Button(name="Next ›", width=80)
+        self.page_info = pn.pane.Markdown("", width=200, align="center")
+        self.table_pager = pn.Row(
+            pn.Spacer(),
+            self.btn_prev_page,
+            self.page_info,
+            self.btn_next_page,
+            pn.Spacer(),
+            visible=TABLE_PAGINATION == "remote",
+            sizing_mode="stretch_width"
+        )
+
         # ======================
         # DOWNLOAD
         # ======================
         self.btn_table_csv_download = pn.widgets.FileDownload(
-            callback=lambda: self.csv_download_callback(pd.DataFrame(self.table.value)),
-            filename='PSET change log.csv',
+            callback=self.csv_download_callback,
+            filename='PSET change log.csv.gz' if CSV_EXPORT_GZIP else 'PSET change log.csv',
             auto=True,
             embed=False,
             button_style='outline',
@@ -171,7 +237,7 @@ class PSET_change_log_Backend:
         )
 
         self.btn_table_excel_download = pn.widgets.FileDownload(
-            callback=lambda: self.excel_download_callback(pd.DataFrame(self.table.value)),
+            callback=self.excel_download_callback,
             filename='PSET change log.xlsx',
             embed=False,
             button_style='outline',
@@ -183,8 +249,13 @@ class PSET_change_log_Backend:
         # ======================
         # BIND EVENTS
         # ======================
-        self.Refresh_button.on_click(self.refresh_click)
-        self.btn_save_edit.on_click(lambda e: self.save_click("update"))
+        self.Refresh_button.on_click(self.on_refresh_click)
+        self.btn_prev_page.on_click(partial(self.on_page_click, -1))
+        self.btn_next_page.on_click(partial(self.on_page_click, 1))
+        self.table.param.watch(self.on_sort_change, "sorters")
+        self.btn_save_edit.on_click(self.on_save_click)
+        self.btn_batch_edit.on_click(self.on_batch_edit_click)
+        self.table.param.watch(self.on_selection_change, "selection")
         self.All_Time_Warning_Checkbox.param.watch(
             self.on_all_time_change, "value"
         )
@@ -207,12 +278,21 @@ class PSET_change_log_Backend:
             self.on_any_change, "value"
         )
 
+        for widget in (
+            self.All_Time_Warning_Checkbox,
+            self.Current_Week_Checkbox,
+            self.Previous_Week_Checkbox,
+            self.Device_name_filter,
+            self.date_range_picker,
+        ):
+            widget.param.watch(self.on_filter_change, "value")
+
   
     # ======================
     # CALLBACKS
     # ======================
-    def refresh_click(self, event=None):
-        sql = self.filter_by_checkbox(
+    def current_filters(self) -> tuple:
+        return (
             self.Current_Week_Checkbox.value,
             self.Previous_Week_Checkbox.value,
             self.All_Time_Warning_Checkbox.value,
@@ -220,22 +300,203 @@ class PSET_change_log_Backend:
             self.date_range_picker.value
         )
 
-        rows = self.fetch_change_log(sql)
+    async def on_refresh_click(self, event=None):
+        await self.refresh_scheduler.request(force=True)
+
+    async def on_filter_change(self, event):
+        await self.refresh_scheduler.request()
+
+    async def refresh_click(self, event=None) -> bool:
+        # Only the latest refresh may update the table: an earlier one still in
+        # flight is cancelled, and its result is dropped if it lands anyway.
+        # Returns whether this refresh's rows reached the table.
+        self._refresh_seq += 1
+        seq = self._refresh_seq
+        previous, self._refresh_task = self._refresh_task, asyncio.current_task()
+        if previous is not None and previous is not self._refresh_task and not previous.done():
+            previous.cancel()
 
-        rows["rev_time"] = rows["rev_time"].fillna("")
-        self.table.value = pd.DataFrame(rows) if rows is not None else pd.DataFrame()
+        self.table.loading = True
+        try:
+            if TABLE_PAGINATION == "remote":
+                self.page = 0
+                return await self.load_page(seq)
+
+            rows = await run_async(self.load_rows, self.current_filters())
+            if seq != self._refresh_seq:
+                return False
+            # Selection holds row positions, which a reload invalidates
+            self.table.selection = []
+            self.table.value = pd.DataFrame(rows) if rows is not None else pd.DataFrame()
+            self.table_loaded = True
+            return True
+        except asyncio.CancelledError:
+            logger.info(f"| PSET_change_log_Backend.refresh_click | Refresh {seq} superseded")
+            return False
+        finally:
+            if seq == self._refresh_seq:
+                self.table.loading = False
+
+    def load_rows(self, filters) -> pd.DataFrame:
+        if CHANGE_LOG_SNAPSHOT:
+            return snapshot.filter(*filters)
+        return self.fetch_change_log(*self.filter_by_checkbox(*filters))
+
+    async def load_page(self, seq=None) -> bool:
+        filters = self.current_filters()
+        sort_column, sort_dir = self.current_sort()
+        sql, params = change_log_page_query(
+            *filters,
+            sort_column=sort_column,
+            sort_dir=sort_dir,
+            limit=PAGE_SIZE,
+            offset=self.page * PAGE_SIZE
+        )
+        rows, total_rows = await asyncio.gather(
+            run_async(self.fetch_change_log, sql, params),
+            run_async(count_cache.get, *change_log_count_query(*filters))
+        )
+        if seq is not None and seq != self._refresh_seq:
+            return False
+
+        self.total_rows = total_rows
+        self.table.selection = []
+        self.table.value = rows
+        self.table_loaded = True
+        self.update_page_info()
+        return True
+
+    def current_sort(self) -> tuple[str, str]:
+        sorters = self.table.sorters or []
+        if sorters:
+            return sorters[0].get("field", "log_id"), sorters[0].get("dir", "asc")
+        return "log_id", "asc"
+
+    def page_count(self) -> int:
+        return max(1, math.ceil(self.total_rows / PAGE_SIZE))
+
+    def update_page_info(self):
+        self.page_info.object = f"Page **{self.page + 1}** of **{self.page_count()}** ({self.total_rows} rows)"
+        self.btn_prev_page.disabled = self.page <= 0
+        self.btn_next_page.disabled = self.page >= self.page_count() - 1
+
+    async def on_page_click(self, step, event=None):
+        page = min(max(self.page + step, 0), self.page_count() - 1)
+        if page != self.page:
+            self.page = page
+            await self.refresh_page()
+
+    async def on_sort_change(self, event):
+        if TABLE_PAGINATION == "remote":
+            self.page = 0
+            await self.refresh_page()
+
+    async def refresh_page(self):
+        self.table.loading = True
+        try:
+            await self.load_page()
+        finally:
+            self.table.loading = False
+
+    def subscribe_changes(self):
+        """Receive live updates for this session's document until it is destroyed."""
+        doc = pn.state.curdoc
+        if not LIVE_UPDATES or doc is None:
+            return
+        key = id(self)
+        listener.register(key, doc, self.apply_changes)
+        pn.state.on_session_destroyed(lambda context: listener.unregister(key))
 
-    def save_click(self, type):
+    async def apply_changes(self, delta: pd.DataFrame):
+        """
+        Patch changed rows and stream new ones that match the current filters.
+        Nothing is pushed before the first refresh has loaded the table.
+        """
+        if TABLE_PAGINATION == "remote":
+            if self.table_loaded:
+                count_cache.invalidate()
+                await self.refresh_page()
+            return
+
+        # The catalog may be due for a reload; keep its query off the event loop
+        devices = await run_async(self.get_Device_name_list)
+        if devices != self.Device_name_filter.options:
+            self.Device_name_filter.options = devices
+
+        if not self.table_loaded:
+            return
+        rows = snapshot.filter_frame(delta, *self.current_filters())
+        if rows.empty:
+            return
+
+        current = self.table.value
+        if current is None or current.empty:
+            # Loaded and empty: no rows matched the filters until now
+            self.table.value = rows
+            return
+
+        added = self.patch_rows(rows)
+        if not added.empty:
+            self.table.stream(added[current.columns.intersection(added.columns, sort=False)], follow=False)
+
+    def patch_rows(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Patch rows that are already in the table, matched by log_id, when their
+        rev differs. Returns the rows that are not in the table.
+        """
+        current = self.table.value
+        if current is None or current.empty:
+            return rows
+
+        positions = pd.Index(current["log_id"]).get_indexer(rows["log_id"])
+        known = positions >= 0
+        changed = rows[known].set_index(current.index[positions[known]])
+        changed = changed[changed["rev"].to_numpy() != current.loc[changed.index, "rev"].to_numpy()]
+        if not changed.empty:
+            self.table.patch(changed[[c for c in current.columns if c in changed.columns]])
+        return rows[~known]
+
+    def export_frame(self) -> pd.DataFrame:
+        # In remote mode the table only holds the visible page
+        if TABLE_PAGINATION == "remote":
+            return self.fetch_change_log(*self.filter_by_checkbox(*self.current_filters()))
+        return pd.DataFrame(self.table.value)
+
+    async def save_click(self, type):
+        log_ids = []
         if type == "update" and self.selected_row.get("row"):
-            row = self.selected_row["row"]
-            self.edit_rev(
-                row["log_id"],
-                self.edit_note.value,
-                self.edit_name.value
-            )
+            log_ids = [self.selected_row["row"]["log_id"]]
+        elif type == "batch":
+            log_ids = self.selected_log_ids()
+
+        if log_ids:
+            self.btn_save_edit.loading = True
+            try:
+                # One transaction and one INSERT ... SELECT for every log
+                rows = await run_async(
+                    self.append_revisions,
+                    log_ids,
+                    self.edit_note.value,
+                    self.edit_name.value
+                )
+            finally:
+                self.btn_save_edit.loading = False
             self.pop_up_edit_form.open = False
+            if type == "batch":
+                self.table.selection = []
+
+            # Patch the saved rows in place; reload only if one is no longer
+            # shown under the current filters.
+            if not rows.empty and self.patch_saved(rows):
+                return
+
+        await self.refresh_scheduler.request(force=True)
 
-        self.refresh_click()
+    def patch_saved(self, rows: pd.DataFrame) -> bool:
+        matching = snapshot.filter_frame(rows, *self.current_filters())
+        if len(matching) < len(rows):
+            return False
+        return self.patch_rows(matching).empty
 
     def download_rev_click(self):
         if not self.selected_row.get("row"):
@@ -246,20 +507,48 @@ class PSET_change_log_Backend:
         pset = row["pset"]
 
 
-        all_rev = self.fetch_detail_rec_all_rev(device,pset)
-        all_rev = all_rev.rename(columns=self.title)
+        all_rev = self.get_detail_rec_all_rev(device,pset)
         if all_rev is None or all_rev.empty:
             return None
+        all_rev = format_numbers(all_rev).rename(columns=self.title)
         
-        csv_data = all_rev.to_csv(index=False)
+        csv_data = all_rev.to_csv(index=False, date_format=DATETIME_FORMAT)
 
         self.pop_up_Rev.open = False
         return BytesIO(csv_data.encode("utf-8"))
 
-    def on_table_edit_click(self, event):
+    async def on_save_click(self, event):
+        await self.save_click(self.edit_mode)
+
+    def selected_log_ids(self) -> list:
+        current = self.table.value
+        if current is None or current.empty or not self.table.selection:
+            return []
+        return current.iloc[self.table.selection]["log_id"].tolist()
+
+    def on_selection_change(self, event):
+        count = len(event.new or [])
+        self.btn_batch_edit.disabled = count == 0
+        self.btn_batch_edit.name = f"Edit selected ({count})" if count else "Edit selected"
+
+    def on_batch_edit_click(self, event):
+        log_ids = self.selected_log_ids()
+        if not log_ids:
+            return
+        self.edit_mode = "batch"
+        self.selected_info.object = (
+            f"**Selected logs:** {len(log_ids)}  \n"
+            f"**Log ID:** {', '.join(str(i) for i in log_ids[:20])}{' ...' if len(log_ids) > 20 else ''}"
+        )
+        self.edit_name.value = ""
+        self.edit_note.value = ""
+        self.pop_up_edit_form.open = True
+
+    async def on_table_edit_click(self, event):
         df = pd.DataFrame(self.table.value)
         row = df.iloc[event.row].to_dict()
         if event.column == "edit":
+            self.edit_mode = "update"
             self.selected_row["row"] = row
             self.set_info_for_edit(row)
 
@@ -267,7 +556,7 @@ class PSET_change_log_Backend:
 
         elif event.column == "Rev0":
             self.selected_row["row"] = row
-            self.compare_rev0(row['device'],row['pset'])
+            await self.compare_rev0(row['device'],row['pset'])
 
     def on_all_time_change(self, event):
         if event.new:
@@ -295,132 +584,76 @@ class PSET_change_log_Backend:
     def on_any_change(self, event):
         self.update_filter_visibility()
     
-    def fetch_change_log(self,sql) -> pd.DataFrame:  
-        summary_df = pd.DataFrame()
+    def fetch_change_log(self, sql, params=None) -> pd.DataFrame:
+        summary_df = pgsql.sql_to_df(query=sql, params=params, db='PSET', mod='PSET_data')
         try:
-            summary_df = pgsql.sql_to_df(query=sql, db='PSET', mod='PSET_data')
-
-            # format date time 
-            summary_df["time_last_change"] = pd.to_datetime(
-                summary_df["time_last_change"],
-                format="%Y-%m-%d:%H:%M:%S"
-            )
-            summary_df["time_last_change"] = summary_df["time_last_change"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            summary_df["rev_time"] = pd.to_datetime(
-                summary_df["rev_time"],
-                format="%Y-%m-%d:%H:%M:%S"
-            )
-            summary_df["rev_time"] = summary_df["rev_time"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            summary_df["createdat"] = pd.to_datetime(
-                summary_df["createdat"],
-                format="%Y-%m-%d:%H:%M:%S"
-            )
-            summary_df["createdat"] = summary_df["createdat"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # summary_df["update_at"] = pd.to_datetime(
-            #     summary_df["update_at"],
-            #     format="%Y-%m-%d:%H:%M:%S"
-            # )
-            # summary_df["update_at"] = summary_df["update_at"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-
-            # summary_df['log_id'] = summary_df['log_id'].astype(str)
-
-            return summary_df
-        
+            return to_display_time(summary_df)
         except Exception as ex:
             logger.error(f"| Exception | {str(ex)}")
             return summary_df
 
-    def edit_rev(self, id, Note, User):
-        query = """
-        INSERT INTO reporting.pset_change_log (
-            log_id,
-            controller_id,
-            device,
-            pset,
-            time_last_change,
-            rev,
-            rev_time,
-            "user",
-            note,
-            createdat,
-            torque_min,
-            torque_target,
-            torque_max,
-            angle_min,
-            angle_target,
-            angle_max
-        )
-        SELECT
-            l.log_id,
-            l.controller_id,
-            l.device,
-            l.pset,
-            l.time_last_change,
-            (r.max_rev + 1)::varchar,
-            CURRENT_TIMESTAMP,
-            NULLIF(TRIM(:user), ''),
-            NULLIF(TRIM(:note), ''),
-            l.createdat,
-            l.torque_min,
-            l.torque_target,
-            l.torque_max,
-            l.angle_min,
-            l.angle_target,
-            l.angle_max
-        FROM reporting.pset_change_log l
-        CROSS JOIN (
-            SELECT COALESCE(MAX(rev::int), 0) AS max_rev
-            FROM reporting.pset_change_log
-            WHERE log_id = :log_id
-        ) r
-        WHERE l.log_id = :log_id
-        ORDER BY l.rev::int DESC
-        LIMIT 1
+    def append_revisions(self, log_ids, Note, User) -> pd.DataFrame:
         """
+        Append one revision per log_id in a single transaction and return the
+        inserted rows.
+
+        The next rev comes from the log's row in pset_change_log_current, locked
+        FOR UPDATE: a concurrent save on the same log waits and then reads the
+        rev this one wrote, so revs never collide and no revision history is
+        scanned. Rows are locked in log_id order so batches cannot deadlock.
+        """
+        log_ids = sorted({int(i) for i in log_ids})
+        if not log_ids:
+            return pd.DataFrame()
 
         params = {
-            "log_id":id,
+            "log_ids": log_ids,
             "note": Note,
             "user": User,
         }
 
-        engine = create_engine(pgsql.connect_url(db=''), echo=False)
-
         try:
-            with engine.begin() as conn:
-                conn.execute(text(query), params)
+            with pgsql.connect(db='PSET', begin=True) as conn:
+                result = conn.execute(text(APPEND_REVISION_SQL), params)
+                rows = pd.DataFrame(result.mappings().all())
         except SQLAlchemyError as e:
-            logger.error(f"| Error updating item {id}: {e}")
+            logger.error(f"| Error appending revision to {log_ids}: {e}")
+            return pd.DataFrame()
 
-    def csv_download_callback(self,df):
+        snapshot.invalidate()
+        if not rows.empty:
+            rev_cache.evict(rows[["device", "pset"]].drop_duplicates().itertuples(index=False))
+            to_display_time(rows)
+        return rows
+
+    async def csv_download_callback(self):
         try:
-            if df is None or df.empty:
-                logger.warning("CSV Download: No data available")
-                return None
-            logger.info(f"CSV Download triggered: {len(df)} rows")
-            
-            df = df.rename(columns=self.title)
-            df_formatted = df.copy()
-            csv_data = df_formatted.to_csv(index=False)
-            
-            return StringIO(csv_data)
+            sql, params = self.filter_by_checkbox(*self.current_filters())
+            logger.info(f"CSV Download triggered: reading in batches of {CSV_EXPORT_CHUNKSIZE}")
+            return await run_async(self.export_csv, sql, params)
 
         except Exception as e:
-            log_error(e)
-            return None
-        
-    def excel_download_callback(self, df):
-        df = df.rename(columns=self.title)
-        workbook = excel_format(df, "PSET")
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-
-        return output
+            # Fail the download rather than hand out a truncated file
+            log_error('PSET_change_log_Backend.csv_download_callback', 'Exception', str(e))
+            if pn.state.notifications is not None:
+                pn.state.notifications.error("CSV download failed, please try again.")
+            raise
+
+    def export_csv(self, sql, params):
+        frames = pgsql.stream_df(query=sql, params=params, db='PSET', mod='PSET_csv_export',
+                                 chunksize=CSV_EXPORT_CHUNKSIZE)
+        return csv_file(
+            frames,
+            prepare=lambda chunk: to_display_time(chunk).rename(columns=self.title),
+            gzip=CSV_EXPORT_GZIP,
+            date_format=DATETIME_FORMAT
+        )
+
+    async def excel_download_callback(self):
+        # Building the workbook takes seconds on large tables; keep it off the
+        # event loop. FileDownload only awaits coroutine functions, not lambdas.
+        df = await run_async(self.export_frame)
+        return await run_async(excel_xlsx, df.rename(columns=self.title), "PSET")
     
     def filter_by_checkbox(
         self,
@@ -429,132 +662,40 @@ class PSET_change_log_Backend:
         All_Time_Warning_Checkbox,
         Device_name,
         date
-    ):
-        base_sql = """
-            WITH ranked_logs AS (
-                SELECT
-                    l.*,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY l.log_id
-                        ORDER BY l.rev DESC
-                    ) AS rn
-                FROM reporting.pset_change_log l
-            )
-            SELECT
-                l.*
-            FROM ranked_logs l
-            WHERE l.rn = 1
-        """
-
-        where_clauses = []
-
-        # All time → no extra where
-        if All_Time_Warning_Checkbox:
-            pass
-
-        # Current + Previous week
-        elif Current_Week_Checkbox and Previous_Week_Checkbox:
-            where_clauses.append("""
-                l.createdat >= date_trunc('week', CURRENT_DATE) - INTERVAL '1 week'
-            """)
-
-        # Current only
-        elif Current_Week_Checkbox:
-            where_clauses.append("""
-                l.createdat >= date_trunc('week', CURRENT_DATE)
-            """)
-
-        # Previous only
-        elif Previous_Week_Checkbox:
-            where_clauses.append("""
-                l.createdat >= date_trunc('week', CURRENT_DATE) - INTERVAL '1 week'
-                AND l.createdat <  date_trunc('week', CURRENT_DATE)
-            """)
-
-        # Device name & date
-        elif len(Device_name) > 0 and date is not None:
-            if "All Device" not in Device_name:
-                device_names = ", ".join(f"'{s}'" for s in Device_name)
-                where_clauses.append(f'l."device" IN ({device_names})')
-
-            where_clauses.append(f"l.createdat >= '{date[0]}'")
-            where_clauses.append(f"l.createdat <= '{date[1]}'")
-
-        # Device only
-        elif len(Device_name) > 0:
-            if "All Device" not in Device_name:
-                device_names = ", ".join(f"'{s}'" for s in Device_name)
-                where_clauses.append(f'l."device" IN ({device_names})')
-
-        # Date only
-        elif date is not None:
-            where_clauses.append(f"l.createdat >= '{date[0]}'")
-            where_clauses.append(f"l.createdat <= '{date[1]}'")
-
-        # Build where clause
-        where_sql = ""
-        if where_clauses:
-            where_sql = " AND " + " AND ".join(where_clauses)
-
-        final_sql = f"""
-            {base_sql}
-            {where_sql}
-            ORDER BY l.log_id ASC;
-        """
-
-        return final_sql
+    ) -> tuple[str, dict]:
+        return change_log_query(
+            Current_Week_Checkbox,
+            Previous_Week_Checkbox,
+            All_Time_Warning_Checkbox,
+            Device_name,
+            date
+        )
 
     def get_Device_name_list(self):
-        query = """
-            SELECT DISTINCT "device"
-            FROM reporting.pset_change_log
-            ORDER BY "device";
-        """
-
-        engine = create_engine(pgsql.connect_url(db=None), echo=False)
-
-        try:
-            with engine.connect() as conn:
-                result = conn.execute(text(query))
-                Device_name_list = [row[0] for row in result]
-
-            Device_name_list.insert(0, "All Device")
-            return Device_name_list
-
-        except SQLAlchemyError as e:
-            logger.error(f"| Error get_Device_name_list | {e}")
-            return []
+        return [ALL_DEVICE, *device_catalog.names()]
 
     def get_Device_name_dict(self):
         # EX. output {'F1': ['F1-AA 123456', 'F1-BB 741852'], 'G1': ['G1-TT 951753', 'G1-PP 357159']}
-        Device_name_list = self.get_Device_name_list()
-        Device_name_list.remove("All Device")
-        groups = defaultdict(list)
+        groups = {prefix: list(names) for prefix, names in device_catalog.by_prefix().items()}
 
         # set defalut none to list
-        groups[""] = [""]
-
-        for s in Device_name_list:
-            prefix = s[:2]   # check the first 2 characters
-            groups[prefix].append(s)
+        return {"": [""], **groups}
 
-        return dict(groups)
-    
     def set_info_for_edit(self, row):
         self.selected_info.object = (
             f"**Log ID:** {row.get('log_id')}  \n"
             f"**Controller ID:** {row.get('controller_id')}  \n"
             f"**Device:** {row.get('device')}  \n"
             f"**PSET:** {row.get('pset')}  \n"
-            f"**Time Last Change:** {row.get('time_last_change')}  \n"
-            f"**Registered Time:** {row.get('createdat')}"
+            f"**Time Last Change:** {format_datetime(row.get('time_last_change'))}  \n"
+            f"**Registered Time:** {format_datetime(row.get('createdat'))}"
         )
 
         self.edit_name.value = row.get("user", "") or ""
         self.edit_note.value = row.get("note", "") or ""
 
-    def compare_rev0(self, device, pset):
-        rev = self.fetch_detail_rec_all_rev(device, pset)
+    async def compare_rev0(self, device, pset):
+        rev = await run_async(self.get_detail_rec_all_rev, device, pset)
 
         if rev is None or rev.empty:
             return
@@ -616,6 +757,9 @@ class PSET_change_log_Backend:
 
         self.pop_up_Rev.open = True
     
+    def get_detail_rec_all_rev(self, device, pset) -> pd.DataFrame:
+        return rev_cache.get(device, pset, self.fetch_detail_rec_all_rev)
+
     def fetch_detail_rec_all_rev(self ,device, pset):
         Q = '''
         SELECT 
@@ -640,41 +784,15 @@ class PSET_change_log_Backend:
         AND pset = :pset
         ORDER BY
             log_id DESC,
-            rev::int DESC;
+            rev DESC;
         '''
         params = {"device": device,
                   "pset": pset}
 
         rev = pgsql.sql_to_df(query=Q, params=params,db='portal', mod='PSET_data')
 
-        # format time
-        rev["time_last_change"] = pd.to_datetime(
-            rev["time_last_change"],
-            format="%Y-%m-%d:%H:%M:%S"
-        )
-        rev["time_last_change"] = rev["time_last_change"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        rev["rev_time"] = pd.to_datetime(
-            rev["rev_time"],
-            format="%Y-%m-%d:%H:%M:%S"
-        )
-        rev["rev_time"] = rev["rev_time"].dt.strftime("%Y-%m-%d %H:%M:%S")
+        to_display_time(rev)
 
-        rev["createdat"] = pd.to_datetime(
-            rev["createdat"],
-            format="%Y-%m-%d:%H:%M:%S"
-        )
-        rev["createdat"] = rev["createdat"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        rev['torque_min'] = rev['torque_min'].map("{:.2f}".format)
-        rev['torque_target'] = rev['torque_target'].map("{:.2f}".format)
-        rev['torque_max'] = rev['torque_max'].map("{:.2f}".format)
-        rev['angle_min'] = rev['angle_min'].map("{:.2f}".format)
-        rev['angle_target'] = rev['angle_target'].map("{:.2f}".format)
-        rev['angle_max'] = rev['angle_max'].map("{:.2f}".format)
-        
-        rev["rev"] = rev["rev"].fillna("")
-        rev["rev_time"] = rev["rev_time"].fillna("")
         rev["user"] = rev["user"].fillna("")
         rev["note"] = rev["note"].fillna("")
         
@@ -80,9 +80,12 @@ pn.extension('tabulator',
              raw_css=raw_css,
              )
 
-backend = PSET_change_log_Backend()
-
 def PSET_change_log_page():
+    # One backend per session: widgets, selection and table state are not shared
+    # between users. Heavy read data lives in the process-level caches.
+    backend = PSET_change_log_Backend()
+    backend.subscribe_changes()
+
     # -----------------------
     # Load custom template
     template_path = Path('apps/app_PSET_change_log/templates/template_PSET_change_log.html')
@@ -109,7 +112,7 @@ def PSET_change_log_page():
         backend.Current_Week_Checkbox,
         backend.Previous_Week_Checkbox,
         backend.All_Time_Warning_Checkbox,
-        pn.pane.Markdown("** Monitoring for changes every 10 minutes."),
+        pn.pane.Markdown("** New changes appear automatically."),
         # backend.pop_up_insert_form,
         # height=300
         sizing_mode='stretch_width'
@@ -120,12 +123,14 @@ def PSET_change_log_page():
 
     PSET_change_log_table = pn.Column(
         # backend.insert_button,
+        backend.btn_batch_edit,
         backend.table,
+        backend.table_pager,
         backend.pop_up_edit_form,
         backend.pop_up_Rev)
     template.add_panel('PSET_change_log_table', PSET_change_log_table)
     return template
 
-# Serve the app
-app = PSET_change_log_page()
-app.servable()
+# Serve the app when run with `panel serve`; app.py calls PSET_change_log_page per session
+if pn.state.served:
+    PSET_change_log_page().servable()
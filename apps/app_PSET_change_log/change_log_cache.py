@@ -0,0 +1,396 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps.app_PSET_change_log import queries
+from apps.app_PSET_change_log.formatting import from_display_timestamp, to_display_time, to_display_timestamp
+from shared.sql import PGSQL
+from shared.tdm_logging import logger, log_error, class_method_name
+
+
+pgsql = PGSQL()
+
+# Concurrent Refresh clicks within this window are served from the same
+# snapshot instead of each issuing a delta query.
+MIN_REFRESH_INTERVAL = timedelta(seconds=5)
+
+# Rows are committed with CURRENT_TIMESTAMP of their transaction, so a slow
+# transaction can land behind the high-water mark. Re-read a short overlap on
+# every delta; merging is idempotent per log_id.
+HWM_OVERLAP = timedelta(minutes=5)
+
+# Deltas only add and replace rows. Logs detached from the partitioned table
+# (reporting.detach_change_log_partitions) leave the snapshot when it is next
+# reloaded in full, at most this long after the previous full load.
+SNAPSHOT_MAX_AGE = timedelta(hours=6)
+
+# Row counts for remote pagination only need to be roughly current.
+COUNT_TTL = timedelta(seconds=60)
+
+# New devices also arrive through the live listener, which invalidates the
+# catalog early; the ttl only bounds how stale a missed one can get.
+DEVICE_CATALOG_TTL = timedelta(minutes=10)
+
+# Revision histories kept per (device, pset). A cached history is re-checked
+# against Postgres at most once per REV_HISTORY_FRESH, so the Compare Rev modal
+# and its download share one fetch.
+REV_HISTORY_MAXSIZE = 64
+REV_HISTORY_FRESH = timedelta(seconds=30)
+
+
+class ChangeLogSnapshot:
+    """
+    Process-level cache of the latest revision of every log_id, read from
+    reporting.pset_change_log_current.
+
+    The first call loads the full projection. Later calls only fetch log_ids
+    with a createdat / rev_time newer than the high-water mark and merge them
+    in, so sessions filter an in-memory frame instead of querying Postgres.
+    get() reloads the full projection once it is SNAPSHOT_MAX_AGE old.
+    """
+    class_str = 'ChangeLogSnapshot'
+
+    LATEST_SQL = f"{queries.LATEST_REV_SQL}{queries.ORDER_BY_SQL}"
+
+    DELTA_SQL = """
+        SELECT
+            l.*
+        FROM reporting.pset_change_log_current l
+        WHERE l.createdat >= :hwm
+           OR l.rev_time >= :hwm
+        ORDER BY l.log_id ASC;
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._hwm = None
+        self._refreshed_at = None
+        self._loaded_at = None
+        self._stale = False
+        self._lock = threading.Lock()
+
+    # ======================
+    # CACHE
+    # ======================
+    def get(self, refresh=True) -> pd.DataFrame:
+        """Return the latest-revision frame, refreshing it incrementally if due."""
+        with self._lock:
+            if self._frame is None or (refresh and self._reload_due()):
+                self._load_full()
+            elif refresh and self._refresh_due():
+                self._load_delta()
+            return self._frame
+
+    def refresh_delta(self) -> pd.DataFrame:
+        """
+        Merge changes now, ignoring MIN_REFRESH_INTERVAL, and return the rows
+        read since the high-water mark (including the HWM_OVERLAP re-read).
+        """
+        with self._lock:
+            if self._frame is None:
+                self._load_full()
+                return self._frame.iloc[0:0]
+            return self._load_delta()
+
+    def invalidate(self, full=False):
+        """Force the next get() to refresh; full=True drops the snapshot entirely."""
+        with self._lock:
+            if full:
+                self._frame = None
+                self._hwm = None
+            self._stale = True
+
+    def _refresh_due(self) -> bool:
+        if self._stale or self._refreshed_at is None:
+            return True
+        return datetime.now() - self._refreshed_at >= MIN_REFRESH_INTERVAL
+
+    def _reload_due(self) -> bool:
+        return self._loaded_at is None or datetime.now() - self._loaded_at >= SNAPSHOT_MAX_AGE
+
+    def _load_full(self):
+        df = pgsql.sql_to_df(query=self.LATEST_SQL, db='PSET', mod='PSET_snapshot_full')
+        if df.empty:
+            logger.warning(f'| {self.class_str} | Full load returned no rows')
+        self._set_frame(to_display_time(df))
+        self._loaded_at = self._refreshed_at
+
+    def _load_delta(self) -> pd.DataFrame:
+        if self._hwm is None:
+            self._load_full()
+            return self._frame.iloc[0:0]
+
+        # Frame timestamps are naive display times; bind an aware value so the
+        # session timezone does not shift the comparison against timestamptz.
+        params = {'hwm': from_display_timestamp(self._hwm - HWM_OVERLAP)}
+        delta = pgsql.sql_to_df(query=self.DELTA_SQL, params=params, db='PSET', mod='PSET_snapshot_delta')
+        if delta.empty:
+            self._refreshed_at = datetime.now()
+            self._stale = False
+            return delta
+
+        to_display_time(delta)
+        frame = self._frame
+        if not frame.empty:
+            frame = frame[~frame['log_id'].isin(delta['log_id'])]
+        merged = pd.concat([frame, delta], ignore_index=True) if not frame.empty else delta
+        logger.info(f'| {self.class_str} | Merged {len(delta)} changed log(s) since {self._hwm}')
+        self._set_frame(merged.sort_values('log_id', ignore_index=True))
+        return delta
+
+    def _set_frame(self, df: pd.DataFrame):
+        self._frame = df
+        self._hwm = self._high_water_mark(df)
+        self._refreshed_at = datetime.now()
+        self._stale = False
+
+    @staticmethod
+    def _high_water_mark(df: pd.DataFrame):
+        if df.empty:
+            return None
+        marks = [df[col].max() for col in ('createdat', 'rev_time') if col in df.columns]
+        marks = [m for m in marks if pd.notna(m)]
+        return max(marks) if marks else None
+
+    # ======================
+    # FILTER
+    # ======================
+    def filter(self, Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+               Device_name, date) -> pd.DataFrame:
+        """In-memory equivalent of queries.change_log_query."""
+        return self.filter_frame(self.get(), Current_Week_Checkbox, Previous_Week_Checkbox,
+                                 All_Time_Warning_Checkbox, Device_name, date)
+
+    def filter_frame(self, df, Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                     Device_name, date) -> pd.DataFrame:
+        """Apply the sidebar filters to any frame shaped like the snapshot."""
+        class_method = class_method_name()
+        if df.empty:
+            return df.copy()
+
+        try:
+            createdat = df['createdat']
+            mask = pd.Series(True, index=df.index)
+            mode = queries.filter_mode(Current_Week_Checkbox, Previous_Week_Checkbox,
+                                       All_Time_Warning_Checkbox, Device_name, date)
+            params = queries.filter_params(mode, Device_name, date)
+
+            # Bounds are aware midnights in the display zone, like the frame
+            if 'week_from' in params:
+                mask &= createdat >= to_display_timestamp(params['week_from'])
+                mask &= createdat < to_display_timestamp(params['week_to'])
+
+            if 'devices' in params:
+                mask &= df['device'].isin(params['devices'])
+
+            if 'date_from' in params:
+                mask &= createdat >= to_display_timestamp(params['date_from'])
+                mask &= createdat <= to_display_timestamp(params['date_to'])
+
+            return df[mask].reset_index(drop=True)
+        except (KeyError, TypeError, ValueError) as err:
+            log_error(class_method, type(err).__name__, str(err))
+            return pd.DataFrame()
+
+
+class CountCache:
+    """
+    Process-level cache of COUNT(*) results keyed by query text and params, so
+    paging through a remote-paginated table only counts each filter once.
+    """
+    class_str = 'CountCache'
+
+    def __init__(self, ttl=COUNT_TTL):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, sql, params) -> int:
+        key = (sql, self._freeze(params))
+        with self._lock:
+            hit = self._counts.get(key)
+            if hit is not None and datetime.now() - hit[1] < self.ttl:
+                return hit[0]
+
+        df = pgsql.sql_to_df(query=sql, params=params, db='PSET', mod='PSET_count')
+        total = int(df.iloc[0, 0]) if not df.empty else 0
+        with self._lock:
+            self._counts[key] = (total, datetime.now())
+        return total
+
+    def invalidate(self):
+        with self._lock:
+            self._counts.clear()
+
+    @staticmethod
+    def _freeze(params):
+        return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (params or {}).items()))
+
+
+class ReadCache:
+    """
+    Process-level memo for read-mostly data shared by every session, such as
+    the device list. Each key is loaded once per ttl; concurrent sessions asking
+    for the same key wait for a single load instead of each querying Postgres.
+    """
+    class_str = 'ReadCache'
+
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, ttl: timedelta = None):
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            hit = self._values.get(key)
+            if hit is not None and (ttl is None or datetime.now() - hit[1] < ttl):
+                return hit[0]
+
+            value = loader()
+            # None means the load failed; do not keep it for a whole ttl
+            if value is not None:
+                self._values[key] = (value, datetime.now())
+                logger.info(f'| {self.class_str} | Loaded "{key}"')
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+
+class DeviceCatalog:
+    """
+    Device names for the sidebar, read from reporting.device_pset_baseline
+    (one row per device and pset) instead of a DISTINCT over the change-log
+    history. Names and their two-character prefix groups are built once per
+    load and shared by every session through read_cache.
+    """
+    class_str = 'DeviceCatalog'
+    key = 'device_catalog'
+
+    SQL = """
+        SELECT DISTINCT
+            b.device
+        FROM reporting.device_pset_baseline b
+        WHERE b.device IS NOT NULL
+        ORDER BY b.device;
+    """
+
+    def __init__(self, cache, ttl=DEVICE_CATALOG_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    def names(self) -> tuple:
+        return self._entry()[0]
+
+    def by_prefix(self) -> dict:
+        return self._entry()[1]
+
+    def contains_all(self, devices) -> bool:
+        known = set(self.names())
+        return all(d in known for d in devices if d is not None)
+
+    def invalidate(self):
+        self.cache.invalidate(self.key)
+
+    def _entry(self) -> tuple:
+        return self.cache.get(self.key, self._load, ttl=self.ttl) or ((), {})
+
+    def _load(self):
+        try:
+            with pgsql.connect(db='PSET') as conn:
+                names = tuple(row[0] for row in conn.execute(text(self.SQL)))
+        except SQLAlchemyError as err:
+            log_error(f'{self.class_str}._load', type(err).__name__, str(err))
+            return None
+
+        # EX. {'F1': ('F1-AA 123456', 'F1-BB 741852'), 'G1': ('G1-TT 951753',)}
+        groups = {}
+        for name in names:
+            groups.setdefault(name[:2], []).append(name)
+        return names, {prefix: tuple(group) for prefix, group in groups.items()}
+
+
+class RevisionCache:
+    """
+    Process-level LRU of revision histories keyed by (device, pset).
+
+    Each entry remembers the pair's MAX(log_id), MAX(rev) and MAX(rev_time)
+    when it was loaded. Once REV_HISTORY_FRESH has passed, that version is
+    compared with a cheap aggregate before the history is reused.
+    append_revisions and the live listener evict pairs as soon as they change.
+    Cached frames are shared between sessions and must not be modified.
+    """
+    class_str = 'RevisionCache'
+
+    VERSION_SQL = """
+        SELECT
+            MAX(l.log_id) AS max_log_id,
+            MAX(l.rev) AS max_rev,
+            MAX(l.rev_time) AS max_rev_time
+        FROM reporting.pset_change_log l
+        WHERE l.device = :device
+        AND l.pset = :pset;
+    """
+
+    def __init__(self, maxsize=REV_HISTORY_MAXSIZE, fresh=REV_HISTORY_FRESH):
+        self.maxsize = maxsize
+        self.fresh = fresh
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, device, pset, loader) -> pd.DataFrame:
+        """Return the history of (device, pset), calling loader(device, pset) on a miss."""
+        key = (device, pset)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                if datetime.now() - hit[2] < self.fresh:
+                    return hit[0]
+
+        version = self._version(device, pset)
+        if hit is not None and version is not None and version == hit[1]:
+            with self._lock:
+                if key in self._entries:
+                    self._entries[key] = (hit[0], version, datetime.now())
+            return hit[0]
+
+        frame = loader(device, pset)
+        if version is not None and frame is not None and not frame.empty:
+            with self._lock:
+                self._entries[key] = (frame, version, datetime.now())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return frame
+
+    def evict(self, pairs):
+        """Drop the cached history of every (device, pset) in pairs."""
+        with self._lock:
+            for key in pairs:
+                self._entries.pop(tuple(key), None)
+
+    def _version(self, device, pset):
+        df = pgsql.sql_to_df(query=self.VERSION_SQL, params={'device': device, 'pset': pset},
+                             db='PSET', mod='PSET_rev_version')
+        if df.empty:
+            return None
+        return tuple(None if pd.isna(v) else v for v in df.iloc[0])
+
+
+snapshot = ChangeLogSnapshot()
+count_cache = CountCache()
+read_cache = ReadCache()
+device_catalog = DeviceCatalog(read_cache)
+rev_cache = RevisionCache()
@@ -0,0 +1,119 @@
+import threading
+from functools import partial
+
+import psycopg
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps.app_PSET_change_log.change_log_cache import snapshot, device_catalog, rev_cache
+from shared.sql import PGSQL
+from shared.tdm_logging import logger, log_error
+
+pgsql = PGSQL()
+
+# Fired once per INSERT statement on reporting.pset_change_log.
+# See assets/sql/migrations/004_change_log_notify.sql
+CHANNEL = 'pset_change_log'
+
+# Notifications arriving within this window are handled as one batch, so a
+# burst of inserts costs one delta query.
+BATCH_WINDOW = 1.0
+
+# Reconnect backoff after the listening connection drops
+RETRY_MIN = 1.0
+RETRY_MAX = 60.0
+
+
+class ChangeLogListener:
+    """
+    Process-level LISTEN on CHANNEL, held on a single pooled connection by a
+    background thread.
+
+    On each batch of notifications the snapshot merges the changed rows once
+    and the delta is handed to every registered session on its own document
+    tick, where the session patches or streams it into its table.
+    """
+    class_str = 'ChangeLogListener'
+
+    def __init__(self, channel=CHANNEL, db='PSET'):
+        self.channel = channel
+        self.db = db
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ======================
+    # SESSIONS
+    # ======================
+    def register(self, key, doc, callback):
+        """callback(delta) is scheduled on doc for every batch of changes."""
+        with self._lock:
+            self._sessions[key] = (doc, callback)
+        self.start()
+
+    def unregister(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    # ======================
+    # THREAD
+    # ======================
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='pset-change-log-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        class_method = f'{self.class_str}._run'
+        retry = RETRY_MIN
+        while not self._stop.is_set():
+            try:
+                with pgsql.listen(self.channel, db=self.db) as conn:
+                    retry = RETRY_MIN
+                    # Catch up on anything inserted while not listening
+                    self._dispatch()
+                    while not self._stop.is_set():
+                        if list(conn.notifies(timeout=BATCH_WINDOW)):
+                            self._dispatch()
+            except (SQLAlchemyError, psycopg.Error) as err:
+                log_error(class_method, type(err).__name__, str(err))
+            except Exception as ex:
+                log_error(class_method, 'Exception', str(ex))
+
+            if self._stop.wait(retry):
+                break
+            retry = min(retry * 2, RETRY_MAX)
+        logger.info(f'| {self.class_str} | Stopped')
+
+    def _dispatch(self):
+        with self._lock:
+            sessions = list(self._sessions.items())
+        if not sessions:
+            return
+
+        delta = snapshot.refresh_delta()
+        if delta.empty:
+            return
+        if not device_catalog.contains_all(delta['device'].unique()):
+            # Reload here, once, rather than in every session's callback
+            device_catalog.invalidate()
+            device_catalog.names()
+        rev_cache.evict(delta[['device', 'pset']].drop_duplicates().itertuples(index=False))
+
+        logger.info(f'| {self.class_str} | Pushing {len(delta)} row(s) to {len(sessions)} session(s)')
+        for key, (doc, callback) in sessions:
+            try:
+                doc.add_next_tick_callback(partial(callback, delta))
+            except Exception as ex:
+                # The document went away without on_session_destroyed
+                logger.warning(f'| {self.class_str} | Dropping session {key}: {ex}')
+                self.unregister(key)
+
+
+listener = ChangeLogListener()
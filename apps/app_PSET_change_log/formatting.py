@@ -0,0 +1,134 @@
+from decimal import ROUND_HALF_UP, Context, Decimal
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+from bokeh.models.widgets.tables import DateFormatter
+
+from config import time_zone
+from shared.sql import ENV
+
+# Timestamps stay datetime64 through the backend and are only turned into text
+# by the Tabulator formatters below, or by to_csv(date_format=...) on export.
+# They are shown, and the week and date filters bounded, in this one zone.
+DISPLAY_TIME_ZONE = ZoneInfo(time_zone(ENV))
+DATETIME_COLUMNS = ["time_last_change", "rev_time", "createdat"]
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Torque and angle limits stay float64 so the table sorts them numerically;
+# they are rounded for display by Tabulator and by format_numbers for text.
+NUMERIC_COLUMNS = ["torque_min", "torque_target", "torque_max", "angle_min", "angle_target", "angle_max"]
+NUMBER_DECIMALS = 2
+
+
+def to_display_time(df: pd.DataFrame, columns=DATETIME_COLUMNS) -> pd.DataFrame:
+    """
+    Convert timestamptz columns in place to naive datetime64 wall times in
+    DISPLAY_TIME_ZONE and return df. Text is parsed as UTC; columns that are
+    already naive datetime64 are taken as converted and left alone.
+    """
+    for col in columns:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, utc=True)
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert(DISPLAY_TIME_ZONE).dt.tz_localize(None)
+        df[col] = series
+    return df
+
+
+def to_display_timestamp(value) -> pd.Timestamp:
+    """An aware value, e.g. a bound from queries.filter_params, as a naive display wall time."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        return value
+    return value.tz_convert(DISPLAY_TIME_ZONE).tz_localize(None)
+
+
+def from_display_timestamp(value) -> pd.Timestamp:
+    """A naive display wall time as an aware timestamp, the earlier one where DST repeats an hour."""
+    return pd.Timestamp(value).tz_localize(DISPLAY_TIME_ZONE, ambiguous=True, nonexistent="shift_forward")
+
+
+def datetime_formatters(columns=DATETIME_COLUMNS) -> dict:
+    return {col: DateFormatter(format=DATETIME_FORMAT, nan_format="") for col in columns}
+
+
+def format_datetime(value) -> str:
+    if value is None or pd.isna(value):
+        return ""
+    return pd.Timestamp(value).strftime(DATETIME_FORMAT)
+
+
+def number_formatters(columns=NUMERIC_COLUMNS, decimals=NUMBER_DECIMALS) -> dict:
+    formatter = {
+        "type": "money",
+        "params": {"decimal": ".", "thousand": "", "symbol": "", "precision": decimals},
+    }
+    return {col: formatter for col in columns}
+
+
+def _split(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Veltkamp: hi keeps the top 26 bits, so products of halves are exact
+    scaled = 134217729.0 * values
+    hi = scaled - (scaled - values)
+    return hi, values - hi
+
+
+def _two_product(a: np.ndarray, b: float) -> tuple[np.ndarray, np.ndarray]:
+    """(p, e) with p = fl(a * b) and p + e == a * b exactly (Dekker)."""
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(np.float64(b))
+    e = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, e
+
+
+def _int_text(ints: np.ndarray, pattern: str) -> np.ndarray:
+    """Object array of pattern.format(i) for ints, formatting each distinct value once."""
+    uniques, codes = np.unique(ints, return_inverse=True)
+    return np.array([pattern.format(i) for i in uniques.tolist()], dtype=object)[codes]
+
+
+def format_numbers(df: pd.DataFrame, columns=NUMERIC_COLUMNS, decimals=NUMBER_DECIMALS) -> pd.DataFrame:
+    """
+    Return a copy of df with columns as fixed-point strings rounded like the
+    table's money formatter (JavaScript toFixed); NULLs become "".
+
+    toFixed rounds the exact binary value half away from zero. Each column is
+    scaled by 10 ** decimals with its rounding error kept (_two_product), so
+    the rounding is exact, and only distinct integer and fraction parts are
+    turned into text. Values too large for that, and infinities, are
+    formatted one by one.
+    """
+    df = df.copy()
+    scale = 10 ** decimals
+    quantum = Decimal(1).scaleb(-decimals)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+        magnitude = np.abs(values)
+        exact = magnitude < 2.0 ** 52 / scale
+
+        p, e = _two_product(np.where(exact, magnitude, 0.0), float(scale))
+        whole = np.floor(p)
+        whole -= (p == whole) & (e < 0)
+        # p - (whole + 0.5) is exact whenever it is close to 0, so e decides ties
+        above = p - (whole + 0.5)
+        scaled = (whole + ((above > 0) | ((above == 0) & (e >= 0)))).astype(np.int64)
+
+        text = _int_text(scaled // scale, "{}")
+        if decimals > 0:
+            text = text + _int_text(scaled % scale, f".{{:0{decimals}d}}")
+        negative = np.signbit(values) & exact
+        text[negative] = "-" + text[negative]
+        text[np.isnan(values)] = ""
+        for i in np.flatnonzero(~exact & ~np.isnan(values)):
+            value = values[i]
+            text[i] = (f"%.{decimals}f" % value if np.isinf(value) else
+                       str(Decimal(value).quantize(quantum, ROUND_HALF_UP, Context(prec=400))))
+        df[col] = text
+    return df
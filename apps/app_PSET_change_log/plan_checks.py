@@ -0,0 +1,130 @@
+"""
+EXPLAIN checks for the hot queries: each must be able to use the index that
+assets/sql/migrations ships for it, and range filters on the partitioned
+change log must be pruned to the partitions they cover.
+
+    python -m apps.app_PSET_change_log.plan_checks
+
+Run after python -m shared.migrations, or after changing a query in
+queries.py. Prints one line per check and exits non-zero if any query can no
+longer reach its index or its partitions, e.g. after a rewrite that wraps an
+indexed column in a cast or function.
+"""
+import sys
+from datetime import date, timedelta
+
+from apps.app_PSET_change_log.change_log_cache import ChangeLogSnapshot, RevisionCache
+from apps.app_PSET_change_log.queries import (MODE_CURRENT_AND_PREVIOUS_WEEK, MODE_DEVICE_AND_DATE,
+                                              APPEND_REVISION_SQL, COUNT_SQL, WHERE_BY_MODE, filter_params)
+from shared.migrations import explain
+from shared.tdm_logging import log_error
+
+_today = date.today()
+_last_month = (_today - timedelta(days=30), _today)
+
+
+def _count_query(mode, Device_name=None, dates=None) -> tuple[str, dict]:
+    # The COUNT shape isolates the filter; ORDER BY log_id could be served by
+    # the primary key instead, which would hide a missing filter index.
+    return f"{COUNT_SQL}{WHERE_BY_MODE[mode]}", filter_params(mode, Device_name, dates)
+
+
+# (name, sql, params, index the plan must contain)
+PLAN_CHECKS = [
+    (
+        "change log, current and previous week",
+        *_count_query(MODE_CURRENT_AND_PREVIOUS_WEEK),
+        "pset_change_log_current_createdat_idx",
+    ),
+    (
+        "change log, device and date",
+        *_count_query(MODE_DEVICE_AND_DATE, ["TR2-88"], _last_month),
+        "pset_change_log_current_device_createdat_idx",
+    ),
+    (
+        "snapshot delta, revisions since the high-water mark",
+        ChangeLogSnapshot.DELTA_SQL,
+        {"hwm": _today - timedelta(days=1)},
+        "pset_change_log_current_rev_time_idx",
+    ),
+    (
+        "append revision, current row lock",
+        APPEND_REVISION_SQL,
+        {"log_ids": [1], "note": "", "user": ""},
+        "pset_change_log_current_pk",
+    ),
+    (
+        "revision history version",
+        RevisionCache.VERSION_SQL,
+        {"device": "TR2-88", "pset": "1"},
+        "pset_change_log_device_pset_rev_idx",
+    ),
+    (
+        "history by createdat",
+        "SELECT COUNT(*) FROM reporting.pset_change_log l WHERE l.createdat >= :since",
+        {"since": _today - timedelta(days=7)},
+        "pset_change_log_createdat_idx",
+    ),
+    (
+        "baseline by device and pset",
+        "SELECT b.time_last_change FROM reporting.device_pset_baseline b WHERE b.device = :device AND b.pset = :pset",
+        {"device": "TR2-88", "pset": "1"},
+        "device_pset_baseline_device_pset_key",
+    ),
+    (
+        "import flow scan bound",
+        'SELECT MAX("createdAt") FROM dbo."Order_EOR_test9"',
+        None,
+        "Order_EOR_test9_createdAt_idx",
+    ),
+]
+
+
+# (name, sql, params, partitioned table, most partitions the plan may read).
+# Two weeks or a month can span at most two monthly partitions.
+PRUNE_CHECKS = [
+    (
+        "current and previous week partitions",
+        *_count_query(MODE_CURRENT_AND_PREVIOUS_WEEK),
+        "pset_change_log_current",
+        2,
+    ),
+    (
+        "device and date partitions",
+        *_count_query(MODE_DEVICE_AND_DATE, ["TR2-88"], _last_month),
+        "pset_change_log_current",
+        2,
+    ),
+]
+
+
+def _explain(sql, params, db) -> tuple[set, set]:
+    try:
+        return explain(sql, params, db=db)
+    except Exception as ex:
+        log_error('plan_checks._explain', type(ex).__name__, str(ex))
+        return set(), set()
+
+
+def run_checks(checks=PLAN_CHECKS, prune_checks=PRUNE_CHECKS, db='PSET') -> list:
+    """Return the names of the checks whose plan does not use the expected index or partitions."""
+    failed = []
+    for name, sql, params, index in checks:
+        used, _ = _explain(sql, params, db)
+        ok = index in used
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: expected {index}, plan uses {sorted(used) or 'no index'}")
+        if not ok:
+            failed.append(name)
+
+    for name, sql, params, table, most in prune_checks:
+        _, relations = _explain(sql, params, db)
+        partitions = sorted(r for r in relations if r.startswith(f"{table}_p") or r == f"{table}_default")
+        ok = 0 < len(partitions) <= most
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: expected at most {most}, plan reads {partitions or relations}")
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run_checks() else 0)
@@ -0,0 +1,206 @@
+import datetime
+
+from apps.app_PSET_change_log.formatting import DISPLAY_TIME_ZONE
+
+# Filter modes resolved from the sidebar widgets. Every mode maps to exactly one
+# query text, so the driver can keep a server-side prepared statement per mode
+# and Postgres can reuse its plan across refreshes.
+MODE_ALL = 'all'
+MODE_CURRENT_AND_PREVIOUS_WEEK = 'current_and_previous_week'
+MODE_CURRENT_WEEK = 'current_week'
+MODE_PREVIOUS_WEEK = 'previous_week'
+MODE_DEVICE_AND_DATE = 'device_and_date'
+MODE_DEVICE = 'device'
+MODE_DATE = 'date'
+
+ALL_DEVICE = "All Device"
+
+# One row per log_id (highest rev), maintained by a trigger on
+# reporting.pset_change_log. See assets/sql/migrations/001_pset_change_log_current.sql
+LATEST_REV_SQL = """
+    SELECT
+        l.*
+    FROM reporting.pset_change_log_current l
+"""
+
+# Week bounds are bound values rather than date_trunc('week', CURRENT_DATE),
+# so the planner prunes the monthly partitions of the table to the one or two
+# the range covers. See assets/sql/migrations/009_partition_change_log.sql
+# They are midnights in DISPLAY_TIME_ZONE, not in the session time zone.
+WEEK_RANGE_SQL = """
+        WHERE l.createdat >= :week_from
+        AND l.createdat < :week_to
+    """
+
+WHERE_BY_MODE = {
+    MODE_ALL: "",
+    MODE_CURRENT_AND_PREVIOUS_WEEK: WEEK_RANGE_SQL,
+    MODE_CURRENT_WEEK: WEEK_RANGE_SQL,
+    MODE_PREVIOUS_WEEK: WEEK_RANGE_SQL,
+    MODE_DEVICE_AND_DATE: """
+        WHERE l."device" = ANY(:devices)
+        AND l.createdat >= :date_from
+        AND l.createdat <= :date_to
+    """,
+    MODE_DEVICE: """
+        WHERE l."device" = ANY(:devices)
+    """,
+    MODE_DATE: """
+        WHERE l.createdat >= :date_from
+        AND l.createdat <= :date_to
+    """,
+}
+
+ORDER_BY_SQL = """
+    ORDER BY l.log_id ASC
+"""
+
+COUNT_SQL = """
+    SELECT
+        COUNT(*) AS total
+    FROM reporting.pset_change_log_current l
+"""
+
+# New revision for each :log_ids, copied from its current row with the note
+# and user replaced. Locking the current row serializes saves per log, and the
+# insert trigger moves that row to the new rev before the lock is released.
+APPEND_REVISION_SQL = """
+    WITH latest AS (
+        SELECT
+            c.*
+        FROM reporting.pset_change_log_current c
+        WHERE c.log_id = ANY(:log_ids)
+        ORDER BY c.log_id
+        FOR UPDATE
+    )
+    INSERT INTO reporting.pset_change_log (
+        log_id, controller_id, device, pset, time_last_change, rev, rev_time,
+        "user", note, createdat, torque_min, torque_target, torque_max,
+        angle_min, angle_target, angle_max
+    )
+    SELECT
+        l.log_id,
+        l.controller_id,
+        l.device,
+        l.pset,
+        l.time_last_change,
+        l.rev + 1,
+        CURRENT_TIMESTAMP,
+        NULLIF(TRIM(:user), ''),
+        NULLIF(TRIM(:note), ''),
+        l.createdat,
+        l.torque_min,
+        l.torque_target,
+        l.torque_max,
+        l.angle_min,
+        l.angle_target,
+        l.angle_max
+    FROM latest l
+    RETURNING *
+"""
+
+# Columns the remote-paginated table may be sorted by. Anything else falls back
+# to log_id so user input never reaches the ORDER BY as text.
+SORTABLE_COLUMNS = (
+    "log_id", "controller_id", "device", "pset", "time_last_change", "rev", "rev_time",
+    "user", "note", "createdat", "torque_min", "torque_target", "torque_max",
+    "angle_min", "angle_target", "angle_max",
+)
+
+
+def filter_mode(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                Device_name, date) -> str:
+    # "All Device" means no device restriction
+    devices = [d for d in (Device_name or []) if d != ALL_DEVICE]
+    all_device = Device_name is not None and ALL_DEVICE in Device_name
+
+    if All_Time_Warning_Checkbox:
+        return MODE_ALL
+    if Current_Week_Checkbox and Previous_Week_Checkbox:
+        return MODE_CURRENT_AND_PREVIOUS_WEEK
+    if Current_Week_Checkbox:
+        return MODE_CURRENT_WEEK
+    if Previous_Week_Checkbox:
+        return MODE_PREVIOUS_WEEK
+    if devices and not all_device:
+        return MODE_DEVICE_AND_DATE if date is not None else MODE_DEVICE
+    if date is not None:
+        return MODE_DATE
+    return MODE_ALL
+
+
+def week_starts(today=None) -> tuple[datetime.date, datetime.date, datetime.date]:
+    """Mondays starting the previous, current and next week in DISPLAY_TIME_ZONE, like date_trunc('week', ...)."""
+    today = today or datetime.datetime.now(DISPLAY_TIME_ZONE).date()
+    current_week = today - datetime.timedelta(days=today.weekday())
+    return (current_week - datetime.timedelta(weeks=1), current_week,
+            current_week + datetime.timedelta(weeks=1))
+
+
+WEEK_RANGES = {
+    MODE_CURRENT_AND_PREVIOUS_WEEK: (0, 2),
+    MODE_CURRENT_WEEK: (1, 2),
+    MODE_PREVIOUS_WEEK: (0, 1),
+}
+
+
+def display_midnight(day) -> datetime.datetime:
+    """Start of day in DISPLAY_TIME_ZONE, as an aware datetime to bind against timestamptz."""
+    if isinstance(day, datetime.datetime):
+        day = day.date()
+    return datetime.datetime.combine(day, datetime.time(), DISPLAY_TIME_ZONE)
+
+
+def filter_params(mode, Device_name, date) -> dict:
+    params = {}
+    if mode in WEEK_RANGES:
+        weeks = week_starts()
+        start, end = WEEK_RANGES[mode]
+        params['week_from'] = display_midnight(weeks[start])
+        params['week_to'] = display_midnight(weeks[end])
+    if mode in (MODE_DEVICE_AND_DATE, MODE_DEVICE):
+        params['devices'] = [d for d in Device_name if d != ALL_DEVICE]
+    if mode in (MODE_DEVICE_AND_DATE, MODE_DATE):
+        params['date_from'] = display_midnight(date[0])
+        params['date_to'] = display_midnight(date[1])
+    return params
+
+
+def change_log_query(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                     Device_name, date) -> tuple[str, dict]:
+    """
+    Build the latest-revision query for the sidebar filters.
+
+    Returns (sql, params). Values are always bound, never interpolated, and the
+    query text only depends on the filter mode.
+    """
+    mode = filter_mode(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                       Device_name, date)
+    sql = f"{LATEST_REV_SQL}{WHERE_BY_MODE[mode]}{ORDER_BY_SQL}"
+    return sql, filter_params(mode, Device_name, date)
+
+
+def change_log_page_query(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                          Device_name, date, sort_column="log_id", sort_dir="asc",
+                          limit=50, offset=0) -> tuple[str, dict]:
+    """One page of the latest-revision query, sorted and sliced in Postgres."""
+    mode = filter_mode(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                       Device_name, date)
+    column = sort_column if sort_column in SORTABLE_COLUMNS else "log_id"
+    direction = "DESC" if str(sort_dir).lower() == "desc" else "ASC"
+    # log_id breaks ties so pages stay stable between requests
+    order_by = f'ORDER BY l."{column}" {direction} NULLS LAST, l.log_id {direction}'
+    if column == "log_id":
+        order_by = f"ORDER BY l.log_id {direction}"
+
+    sql = f"{LATEST_REV_SQL}{WHERE_BY_MODE[mode]}\n    {order_by}\n    LIMIT :limit OFFSET :offset"
+    params = filter_params(mode, Device_name, date)
+    params.update(limit=int(limit), offset=int(offset))
+    return sql, params
+
+
+def change_log_count_query(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                           Device_name, date) -> tuple[str, dict]:
+    mode = filter_mode(Current_Week_Checkbox, Previous_Week_Checkbox, All_Time_Warning_Checkbox,
+                       Device_name, date)
+    return f"{COUNT_SQL}{WHERE_BY_MODE[mode]}", filter_params(mode, Device_name, date)
@@ -0,0 +1,67 @@
+import asyncio
+
+from shared.tdm_logging import logger
+
+# Checkbox watchers set each other, so one click fires several change events.
+# Wait this long for the filters to settle before querying.
+REFRESH_DEBOUNCE = 0.3
+
+
+class RefreshScheduler:
+    """
+    Per-session gate in front of the change-log refresh.
+
+    resolve() returns the (sql, params) the current filters map to and run() is
+    the coroutine that refreshes the table; it returns True only when its rows
+    reached the table, False when a later refresh superseded it. request()
+    debounces bursts of
+    widget changes into one run, joins a run already in flight for the same
+    query, and skips the run when the query matches the last one applied.
+    force=True (the Refresh button, after a save) skips the debounce and the
+    last-query check but still joins an identical run in flight.
+    """
+    class_str = 'RefreshScheduler'
+
+    def __init__(self, resolve, run, delay=REFRESH_DEBOUNCE):
+        self.resolve = resolve
+        self.run = run
+        self.delay = delay
+        self._generation = 0
+        self._last_key = None
+        self._inflight = None
+        self._inflight_key = None
+
+    async def request(self, force=False):
+        self._generation += 1
+        generation = self._generation
+        if not force:
+            await asyncio.sleep(self.delay)
+            if generation != self._generation:
+                # A later change arrived during the debounce window
+                return
+
+        key = self._key(*self.resolve())
+        if self._inflight is not None and not self._inflight.done() and key == self._inflight_key:
+            await asyncio.shield(self._inflight)
+            return
+        if not force and key == self._last_key:
+            logger.info(f'| {self.class_str} | Filters unchanged, refresh skipped')
+            return
+
+        task = asyncio.ensure_future(self.run())
+        self._inflight, self._inflight_key = task, key
+        try:
+            # A superseded run returns normally; only the applied one
+            # describes what the table shows
+            if await asyncio.shield(task):
+                self._last_key = key
+        finally:
+            if self._inflight is task:
+                self._inflight, self._inflight_key = None, None
+
+    @staticmethod
+    def _key(sql, params):
+        frozen = tuple(sorted(
+            (k, tuple(v) if isinstance(v, (list, tuple)) else v) for k, v in (params or {}).items()
+        ))
+        return sql, frozen
@@ -0,0 +1,89 @@
+-- Current-revision projection of reporting.pset_change_log.
+--
+-- Holds exactly one row per log_id: the highest rev. It is maintained by an
+-- AFTER INSERT trigger, so revisions written by edit_rev and rows inserted by
+-- the Kestra import flow both keep it current without any change to writers.
+-- Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS reporting.pset_change_log_current (
+    log_id int4 NOT NULL,
+    controller_id varchar(50),
+    device varchar(255),
+    pset varchar(20),
+    time_last_change timestamptz,
+    rev varchar(20),
+    rev_time timestamptz,
+    "user" varchar(50),
+    note varchar(255),
+    createdat timestamptz,
+    torque_min double precision,
+    torque_target double precision,
+    torque_max double precision,
+    angle_min double precision,
+    angle_target double precision,
+    angle_max double precision,
+    CONSTRAINT pset_change_log_current_pk PRIMARY KEY (log_id)
+);
+
+CREATE OR REPLACE FUNCTION reporting.pset_change_log_current_upsert()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO reporting.pset_change_log_current AS c (
+        log_id, controller_id, device, pset, time_last_change, rev, rev_time,
+        "user", note, createdat, torque_min, torque_target, torque_max,
+        angle_min, angle_target, angle_max
+    )
+    VALUES (
+        NEW.log_id, NEW.controller_id, NEW.device, NEW.pset, NEW.time_last_change, NEW.rev, NEW.rev_time,
+        NEW."user", NEW.note, NEW.createdat, NEW.torque_min, NEW.torque_target, NEW.torque_max,
+        NEW.angle_min, NEW.angle_target, NEW.angle_max
+    )
+    ON CONFLICT (log_id) DO UPDATE SET
+        controller_id = EXCLUDED.controller_id,
+        device = EXCLUDED.device,
+        pset = EXCLUDED.pset,
+        time_last_change = EXCLUDED.time_last_change,
+        rev = EXCLUDED.rev,
+        rev_time = EXCLUDED.rev_time,
+        "user" = EXCLUDED."user",
+        note = EXCLUDED.note,
+        createdat = EXCLUDED.createdat,
+        torque_min = EXCLUDED.torque_min,
+        torque_target = EXCLUDED.torque_target,
+        torque_max = EXCLUDED.torque_max,
+        angle_min = EXCLUDED.angle_min,
+        angle_target = EXCLUDED.angle_target,
+        angle_max = EXCLUDED.angle_max
+    WHERE EXCLUDED.rev::int >= c.rev::int;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pset_change_log_current_upsert ON reporting.pset_change_log;
+CREATE TRIGGER pset_change_log_current_upsert
+AFTER INSERT ON reporting.pset_change_log
+FOR EACH ROW EXECUTE FUNCTION reporting.pset_change_log_current_upsert();
+
+-- Backfill from the existing history
+INSERT INTO reporting.pset_change_log_current
+SELECT DISTINCT ON (l.log_id)
+    l.log_id, l.controller_id, l.device, l.pset, l.time_last_change, l.rev, l.rev_time,
+    l."user", l.note, l.createdat, l.torque_min, l.torque_target, l.torque_max,
+    l.angle_min, l.angle_target, l.angle_max
+FROM reporting.pset_change_log l
+ORDER BY l.log_id, l.rev::int DESC
+ON CONFLICT (log_id) DO NOTHING;
+
+-- Week filters and device + date filters on the projection
+CREATE INDEX IF NOT EXISTS pset_change_log_current_createdat_idx
+    ON reporting.pset_change_log_current (createdat);
+CREATE INDEX IF NOT EXISTS pset_change_log_current_device_createdat_idx
+    ON reporting.pset_change_log_current (device, createdat);
+
+-- Latest revision lookup per log (edit_rev, backfill)
+CREATE INDEX IF NOT EXISTS pset_change_log_log_id_rev_idx
+    ON reporting.pset_change_log (log_id, (rev::int));
+
+ANALYZE reporting.pset_change_log_current;
@@ -0,0 +1,93 @@
+-- Store rev as an integer.
+--
+-- rev was varchar, so every hot query cast it (MAX(rev::int), ORDER BY rev::int)
+-- and text ordering put '10' before '9'. Convert the history table and the
+-- projection, keep (log_id, rev) unique, and drop the expression index that
+-- only existed to support the cast. Safe to re-run.
+
+DROP INDEX IF EXISTS reporting.pset_change_log_log_id_rev_idx;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'reporting' AND table_name = 'pset_change_log'
+          AND column_name = 'rev' AND data_type <> 'integer'
+    ) THEN
+        ALTER TABLE reporting.pset_change_log
+            ALTER COLUMN rev TYPE int4 USING rev::int4;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'reporting' AND table_name = 'pset_change_log_current'
+          AND column_name = 'rev' AND data_type <> 'integer'
+    ) THEN
+        ALTER TABLE reporting.pset_change_log_current
+            ALTER COLUMN rev TYPE int4 USING rev::int4;
+    END IF;
+END;
+$$;
+
+ALTER TABLE reporting.pset_change_log ALTER COLUMN rev SET DEFAULT 0;
+ALTER TABLE reporting.pset_change_log ALTER COLUMN rev SET NOT NULL;
+
+-- (log_id, rev) must be unique. The original DDL already has it as the primary
+-- key; add a unique constraint only when that key is missing.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_constraint c
+        WHERE c.conrelid = 'reporting.pset_change_log'::regclass
+          AND c.contype IN ('p', 'u')
+          AND c.conkey = ARRAY[
+              (SELECT attnum FROM pg_attribute WHERE attrelid = c.conrelid AND attname = 'log_id'),
+              (SELECT attnum FROM pg_attribute WHERE attrelid = c.conrelid AND attname = 'rev')
+          ]::int2[]
+    ) THEN
+        ALTER TABLE reporting.pset_change_log
+            ADD CONSTRAINT pset_change_log_log_id_rev_key UNIQUE (log_id, rev);
+    END IF;
+END;
+$$;
+
+-- Projection trigger without the casts
+CREATE OR REPLACE FUNCTION reporting.pset_change_log_current_upsert()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO reporting.pset_change_log_current AS c (
+        log_id, controller_id, device, pset, time_last_change, rev, rev_time,
+        "user", note, createdat, torque_min, torque_target, torque_max,
+        angle_min, angle_target, angle_max
+    )
+    VALUES (
+        NEW.log_id, NEW.controller_id, NEW.device, NEW.pset, NEW.time_last_change, NEW.rev, NEW.rev_time,
+        NEW."user", NEW.note, NEW.createdat, NEW.torque_min, NEW.torque_target, NEW.torque_max,
+        NEW.angle_min, NEW.angle_target, NEW.angle_max
+    )
+    ON CONFLICT (log_id) DO UPDATE SET
+        controller_id = EXCLUDED.controller_id,
+        device = EXCLUDED.device,
+        pset = EXCLUDED.pset,
+        time_last_change = EXCLUDED.time_last_change,
+        rev = EXCLUDED.rev,
+        rev_time = EXCLUDED.rev_time,
+        "user" = EXCLUDED."user",
+        note = EXCLUDED.note,
+        createdat = EXCLUDED.createdat,
+        torque_min = EXCLUDED.torque_min,
+        torque_target = EXCLUDED.torque_target,
+        torque_max = EXCLUDED.torque_max,
+        angle_min = EXCLUDED.angle_min,
+        angle_target = EXCLUDED.angle_target,
+        angle_max = EXCLUDED.angle_max
+    WHERE EXCLUDED.rev >= c.rev;
+    RETURN NULL;
+END;
+$$;
+
+ANALYZE reporting.pset_change_log;
+ANALYZE reporting.pset_change_log_current;
@@ -0,0 +1,42 @@
+-- Native timestamptz for every time column read by the app and the import flow.
+--
+-- Older databases stored time_last_change as text ("YYYY-MM-DD:HH:MI:SS" and
+-- other variants), which forced pd.to_datetime / strptime on every refresh.
+-- Text columns are parsed once here as UTC; timestamp without time zone columns
+-- are taken as UTC; timestamptz columns are left alone. Safe to re-run.
+
+CREATE OR REPLACE FUNCTION pg_temp.to_timestamptz_column(p_table text, p_column text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_type text;
+BEGIN
+    SELECT data_type INTO v_type
+    FROM information_schema.columns
+    WHERE table_schema = 'reporting' AND table_name = p_table AND column_name = p_column;
+
+    IF v_type IS NULL OR v_type = 'timestamp with time zone' THEN
+        RETURN;
+    ELSIF v_type = 'timestamp without time zone' THEN
+        EXECUTE format(
+            'ALTER TABLE reporting.%I ALTER COLUMN %I TYPE timestamptz USING %I AT TIME ZONE ''UTC''',
+            p_table, p_column, p_column);
+    ELSE
+        EXECUTE format(
+            'ALTER TABLE reporting.%I ALTER COLUMN %I TYPE timestamptz '
+            'USING regexp_replace(trim(%I::text), ''^(\d{4}-\d{2}-\d{2})[:T ]'', ''\1 '')::timestamp AT TIME ZONE ''UTC''',
+            p_table, p_column, p_column);
+    END IF;
+END;
+$$;
+
+SELECT pg_temp.to_timestamptz_column('pset_change_log', 'time_last_change');
+SELECT pg_temp.to_timestamptz_column('pset_change_log', 'rev_time');
+SELECT pg_temp.to_timestamptz_column('pset_change_log', 'createdat');
+SELECT pg_temp.to_timestamptz_column('pset_change_log_current', 'time_last_change');
+SELECT pg_temp.to_timestamptz_column('pset_change_log_current', 'rev_time');
+SELECT pg_temp.to_timestamptz_column('pset_change_log_current', 'createdat');
+SELECT pg_temp.to_timestamptz_column('device_pset_baseline', 'time_last_change');
+SELECT pg_temp.to_timestamptz_column('device_pset_baseline', 'created_at');
+SELECT pg_temp.to_timestamptz_column('device_pset_baseline', 'update_at');
@@ -0,0 +1,27 @@
+-- Notify listeners when rows are added to reporting.pset_change_log.
+--
+-- One notification per INSERT statement on channel pset_change_log, so a bulk
+-- insert from the Kestra flow wakes the app once, not once per row. The
+-- payload is the number of rows inserted; listeners read the rows themselves
+-- from reporting.pset_change_log_current. Safe to re-run.
+
+CREATE OR REPLACE FUNCTION reporting.pset_change_log_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    inserted int;
+BEGIN
+    SELECT COUNT(*) INTO inserted FROM new_rows;
+    IF inserted > 0 THEN
+        PERFORM pg_notify('pset_change_log', inserted::text);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pset_change_log_notify ON reporting.pset_change_log;
+CREATE TRIGGER pset_change_log_notify
+AFTER INSERT ON reporting.pset_change_log
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reporting.pset_change_log_notify();
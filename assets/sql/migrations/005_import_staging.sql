@@ -0,0 +1,24 @@
+-- Staging table for the Kestra import flow's bulk apply.
+--
+-- compare_pset writes every new and changed PSET to one CSV, which is COPYed
+-- here and applied with set-based statements in a single transaction, instead
+-- of one connection and transaction per PSET. UNLOGGED: the rows only live for
+-- the duration of one flow run. Safe to re-run.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS reporting.pset_import_staging (
+    kind varchar(10) NOT NULL,          -- 'new' baseline row or 'update'
+    controller_id varchar(50),
+    device varchar(255) NOT NULL,
+    pset varchar(20) NOT NULL,
+    time_last_change timestamptz,
+    torque_min double precision,
+    torque_target double precision,
+    torque_max double precision,
+    angle_min double precision,
+    angle_target double precision,
+    angle_max double precision
+);
+
+-- UPDATE ... FROM staging joins the baseline on (device, pset)
+CREATE INDEX IF NOT EXISTS device_pset_baseline_device_pset_idx
+    ON reporting.device_pset_baseline (device, pset);
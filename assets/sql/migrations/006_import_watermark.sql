@@ -0,0 +1,24 @@
+-- Durable high-water mark for the Kestra import flow.
+--
+-- Each run fixes its upper bound (scan_to = newest "createdAt" in the EOR
+-- table), scans only rows after last_created_at, and moves last_created_at to
+-- scan_to once the diff has been applied. A failed run leaves the mark where
+-- it was, so the next run covers the same rows again; the diff against the
+-- baseline makes that idempotent. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS reporting.import_watermark (
+    flow_id varchar(100) NOT NULL,
+    last_created_at timestamptz,
+    scan_to timestamptz,
+    updated_at timestamptz,
+    CONSTRAINT import_watermark_pk PRIMARY KEY (flow_id)
+);
+
+INSERT INTO reporting.import_watermark (flow_id)
+VALUES ('PSET_change_Log')
+ON CONFLICT (flow_id) DO NOTHING;
+
+-- Range scan on new tightening results only. CONCURRENTLY keeps the EOR table
+-- writable while the index builds, so run this file outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Order_EOR_test9_createdAt_idx"
+    ON dbo."Order_EOR_test9" ("createdAt");
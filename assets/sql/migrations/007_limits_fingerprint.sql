@@ -0,0 +1,13 @@
+-- Fingerprint of a PSET's six limit values on the baseline.
+--
+-- The import flow only logs a revision when the fingerprint changes, so a
+-- controller re-stamping timeLastChange with the same limits no longer adds a
+-- row to reporting.pset_change_log. The value is computed by
+-- shared/pset_diff.limits_fingerprint; rows start NULL and are filled on the
+-- next import that sees them. Safe to re-run.
+
+ALTER TABLE reporting.device_pset_baseline
+    ADD COLUMN IF NOT EXISTS limits_fingerprint int8;
+
+ALTER TABLE reporting.pset_import_staging
+    ADD COLUMN IF NOT EXISTS limits_fingerprint int8;
@@ -0,0 +1,63 @@
+-- Indexes for the app's and the import flow's hot queries on the history and
+-- baseline tables.
+--
+-- Already covered by earlier migrations, not repeated here:
+--   (log_id, rev) on pset_change_log is its primary key (002)
+--   createdat and (device, createdat) on pset_change_log_current (001)
+--   "createdAt" on dbo."Order_EOR_test9" (006). The flow compares the plain
+--   column, so an expression index on it would never be picked.
+--
+-- Every index is built CONCURRENTLY so the tables stay writable, so run this
+-- file outside a transaction (python -m shared.migrations does). Safe to re-run.
+
+-- Revision history modal and RevisionCache.VERSION_SQL:
+-- WHERE device = :device AND pset = :pset, MAX(rev)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS pset_change_log_device_pset_rev_idx
+    ON reporting.pset_change_log (device, pset, rev);
+
+-- Week and date range scans on the history table
+CREATE INDEX CONCURRENTLY IF NOT EXISTS pset_change_log_createdat_idx
+    ON reporting.pset_change_log (createdat);
+
+-- One baseline row per (device, pset). The import flow's UPDATE ... FROM
+-- staging relies on it, so refuse to continue while duplicates exist instead
+-- of picking a row to delete.
+DO $$
+DECLARE
+    duplicates int;
+BEGIN
+    SELECT COUNT(*) INTO duplicates
+    FROM (
+        SELECT 1
+        FROM reporting.device_pset_baseline
+        GROUP BY device, pset
+        HAVING COUNT(*) > 1
+    ) d;
+    IF duplicates > 0 THEN
+        RAISE EXCEPTION '% (device, pset) pairs have more than one row in reporting.device_pset_baseline', duplicates;
+    END IF;
+END;
+$$;
+
+-- A failed CONCURRENTLY build leaves an INVALID index behind that IF NOT
+-- EXISTS would keep; drop it so the next run rebuilds it.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i
+        WHERE i.indexrelid = to_regclass('reporting.device_pset_baseline_device_pset_key')
+          AND NOT i.indisvalid
+    ) THEN
+        DROP INDEX reporting.device_pset_baseline_device_pset_key;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS device_pset_baseline_device_pset_key
+    ON reporting.device_pset_baseline (device, pset);
+
+-- The unique index replaces the plain one from 005
+DROP INDEX CONCURRENTLY IF EXISTS reporting.device_pset_baseline_device_pset_idx;
+
+ANALYZE reporting.pset_change_log;
+ANALYZE reporting.device_pset_baseline;
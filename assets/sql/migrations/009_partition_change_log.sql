@@ -0,0 +1,268 @@
+-- Monthly range partitions on createdat for reporting.pset_change_log and its
+-- projection reporting.pset_change_log_current.
+--
+-- Week and date filters are createdat ranges, so with bounds passed as values
+-- (apps/app_PSET_change_log/queries.py) the planner only reads the one or two
+-- monthly partitions they cover. Revisions copy createdat from the log's
+-- current row, so it never changes for a log_id and can join the keys:
+-- (log_id, rev, createdat) on the history, (log_id, createdat) on the
+-- projection.
+--
+-- Existing rows are copied into the new tables in this transaction and the
+-- old heaps are dropped; both tables are locked until it commits, so run it
+-- in a maintenance window. Rows with a NULL createdat, or a log_id whose
+-- revisions have different createdat values, stop the migration.
+-- A DEFAULT partition catches rows outside the created months; the next
+-- ensure_change_log_partitions moves them into their month.
+-- Safe to re-run; 001 and 002 must not be re-run by hand after this one.
+
+-- Create (or complete) the month partition of p_table that holds p_month.
+CREATE OR REPLACE FUNCTION reporting.create_change_log_partition(p_table text, p_month date)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_from date := date_trunc('month', p_month)::date;
+    v_to date := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+    v_name text := format('%s_p%s', p_table, to_char(p_month, 'YYYYMM'));
+    v_default text := p_table || '_default';
+BEGIN
+    IF to_regclass(format('reporting.%I', v_name)) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format('CREATE TABLE reporting.%I (LIKE reporting.%I INCLUDING DEFAULTS INCLUDING STORAGE)',
+                   v_name, p_table);
+
+    -- ATTACH fails while the default partition holds rows of this month
+    IF to_regclass(format('reporting.%I', v_default)) IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM reporting.%I WHERE createdat >= %L AND createdat < %L RETURNING *) '
+            'INSERT INTO reporting.%I SELECT * FROM moved',
+            v_default, v_from, v_to, v_name);
+    END IF;
+
+    EXECUTE format('ALTER TABLE reporting.%I ATTACH PARTITION reporting.%I FOR VALUES FROM (%L) TO (%L)',
+                   p_table, v_name, v_from, v_to);
+    RETURN true;
+END;
+$$;
+
+-- Partitions for the current month and p_months_ahead after it, on both
+-- tables. Called by Flow/change_log_partitions.yaml; returns the new tables.
+CREATE OR REPLACE FUNCTION reporting.ensure_change_log_partitions(p_months_ahead int DEFAULT 3)
+RETURNS SETOF text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_month date;
+    v_table text;
+BEGIN
+    FOR v_month IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_DATE),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead),
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        FOREACH v_table IN ARRAY ARRAY['pset_change_log', 'pset_change_log_current'] LOOP
+            IF reporting.create_change_log_partition(v_table, v_month) THEN
+                RETURN NEXT format('%s_p%s', v_table, to_char(v_month, 'YYYYMM'));
+            END IF;
+        END LOOP;
+    END LOOP;
+END;
+$$;
+
+-- Detach the month partitions of both tables that ended more than
+-- p_retention_months before the current month and move them to
+-- p_archive_schema, where they can be dumped and dropped. Detached logs leave
+-- the app, history included. Returns the archived tables.
+CREATE OR REPLACE FUNCTION reporting.detach_change_log_partitions(p_retention_months int,
+                                                                 p_archive_schema text DEFAULT 'archive')
+RETURNS SETOF text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_cutoff date;
+    v_part record;
+BEGIN
+    IF p_retention_months IS NULL OR p_retention_months < 1 THEN
+        RAISE EXCEPTION 'p_retention_months must be at least 1, got %', p_retention_months;
+    END IF;
+    v_cutoff := (date_trunc('month', CURRENT_DATE) - make_interval(months => p_retention_months))::date;
+
+    EXECUTE format('CREATE SCHEMA IF NOT EXISTS %I', p_archive_schema);
+
+    FOR v_part IN
+        SELECT parent.relname AS parent, child.relname AS child
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = 'reporting'
+          AND parent.relname IN ('pset_change_log', 'pset_change_log_current')
+          AND child.relkind = 'r'
+          AND child.relname ~ '_p\d{6}$'
+          -- upper bound of month YYYYMM is the first of the next month
+          AND to_date(right(child.relname, 6), 'YYYYMM') + INTERVAL '1 month' <= v_cutoff
+        ORDER BY child.relname
+    LOOP
+        EXECUTE format('ALTER TABLE reporting.%I DETACH PARTITION reporting.%I', v_part.parent, v_part.child);
+        EXECUTE format('ALTER TABLE reporting.%I SET SCHEMA %I', v_part.child, p_archive_schema);
+        RETURN NEXT format('%s.%s', p_archive_schema, v_part.child);
+    END LOOP;
+END;
+$$;
+
+-- Replace a plain table by a partitioned copy holding the same rows.
+CREATE OR REPLACE FUNCTION pg_temp.partition_by_createdat(p_table text, p_months_ahead int)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_old text := p_table || '_unpartitioned';
+    v_seq text;
+    v_first date;
+    v_month date;
+    v_rows bigint;
+    v_copied bigint;
+BEGIN
+    IF (SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(format('reporting.%I', p_table))) = 'p' THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('SELECT COUNT(*) FROM reporting.%I WHERE createdat IS NULL', p_table) INTO v_rows;
+    IF v_rows > 0 THEN
+        RAISE EXCEPTION '% rows of reporting.% have no createdat', v_rows, p_table;
+    END IF;
+
+    -- The new keys assume createdat never changes for a log_id. If a log's
+    -- revisions disagree, they would spread over partitions and the
+    -- projection could hold one row per createdat.
+    EXECUTE format(
+        'SELECT COUNT(*) FROM (SELECT log_id FROM reporting.%I GROUP BY log_id '
+        'HAVING COUNT(DISTINCT createdat) > 1) d', p_table) INTO v_rows;
+    IF v_rows > 0 THEN
+        RAISE EXCEPTION '% log_ids of reporting.% have more than one createdat', v_rows, p_table;
+    END IF;
+
+    EXECUTE format('ALTER TABLE reporting.%I RENAME TO %I', p_table, v_old);
+    EXECUTE format(
+        'CREATE TABLE reporting.%I (LIKE reporting.%I INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS) '
+        'PARTITION BY RANGE (createdat)', p_table, v_old);
+    EXECUTE format('CREATE TABLE reporting.%I PARTITION OF reporting.%I DEFAULT', p_table || '_default', p_table);
+
+    -- log_id's sequence must outlive the old table
+    v_seq := pg_get_serial_sequence(format('reporting.%I', v_old), 'log_id');
+    IF v_seq IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY reporting.%I.log_id', v_seq, p_table);
+    END IF;
+
+    EXECUTE format('SELECT date_trunc(''month'', MIN(createdat))::date FROM reporting.%I', v_old) INTO v_first;
+    FOR v_month IN
+        SELECT generate_series(
+            COALESCE(v_first, date_trunc('month', CURRENT_DATE)::date)::timestamptz,
+            date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead),
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM reporting.create_change_log_partition(p_table, v_month);
+    END LOOP;
+
+    -- No triggers exist on the new table yet, so the copy neither re-runs the
+    -- projection upsert nor notifies the app
+    EXECUTE format('INSERT INTO reporting.%I SELECT * FROM reporting.%I', p_table, v_old);
+    GET DIAGNOSTICS v_copied = ROW_COUNT;
+    EXECUTE format('SELECT COUNT(*) FROM reporting.%I', v_old) INTO v_rows;
+    IF v_copied <> v_rows THEN
+        RAISE EXCEPTION 'Copied % of % rows into reporting.%', v_copied, v_rows, p_table;
+    END IF;
+
+    EXECUTE format('DROP TABLE reporting.%I', v_old);
+END;
+$$;
+
+SELECT pg_temp.partition_by_createdat('pset_change_log', 3);
+SELECT pg_temp.partition_by_createdat('pset_change_log_current', 3);
+
+-- Keys and indexes on the partitioned parents; each partition gets its own
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'reporting.pset_change_log'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE reporting.pset_change_log
+            ADD CONSTRAINT pset_change_log_pk PRIMARY KEY (log_id, rev, createdat);
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'reporting.pset_change_log_current'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE reporting.pset_change_log_current
+            ADD CONSTRAINT pset_change_log_current_pk PRIMARY KEY (log_id, createdat);
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS pset_change_log_device_pset_rev_idx
+    ON reporting.pset_change_log (device, pset, rev);
+CREATE INDEX IF NOT EXISTS pset_change_log_createdat_idx
+    ON reporting.pset_change_log (createdat);
+CREATE INDEX IF NOT EXISTS pset_change_log_current_createdat_idx
+    ON reporting.pset_change_log_current (createdat);
+CREATE INDEX IF NOT EXISTS pset_change_log_current_device_createdat_idx
+    ON reporting.pset_change_log_current (device, createdat);
+
+-- Projection trigger, now keyed on (log_id, createdat)
+CREATE OR REPLACE FUNCTION reporting.pset_change_log_current_upsert()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO reporting.pset_change_log_current AS c (
+        log_id, controller_id, device, pset, time_last_change, rev, rev_time,
+        "user", note, createdat, torque_min, torque_target, torque_max,
+        angle_min, angle_target, angle_max
+    )
+    VALUES (
+        NEW.log_id, NEW.controller_id, NEW.device, NEW.pset, NEW.time_last_change, NEW.rev, NEW.rev_time,
+        NEW."user", NEW.note, NEW.createdat, NEW.torque_min, NEW.torque_target, NEW.torque_max,
+        NEW.angle_min, NEW.angle_target, NEW.angle_max
+    )
+    ON CONFLICT (log_id, createdat) DO UPDATE SET
+        controller_id = EXCLUDED.controller_id,
+        device = EXCLUDED.device,
+        pset = EXCLUDED.pset,
+        time_last_change = EXCLUDED.time_last_change,
+        rev = EXCLUDED.rev,
+        rev_time = EXCLUDED.rev_time,
+        "user" = EXCLUDED."user",
+        note = EXCLUDED.note,
+        torque_min = EXCLUDED.torque_min,
+        torque_target = EXCLUDED.torque_target,
+        torque_max = EXCLUDED.torque_max,
+        angle_min = EXCLUDED.angle_min,
+        angle_target = EXCLUDED.angle_target,
+        angle_max = EXCLUDED.angle_max
+    WHERE EXCLUDED.rev >= c.rev;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pset_change_log_current_upsert ON reporting.pset_change_log;
+CREATE TRIGGER pset_change_log_current_upsert
+AFTER INSERT ON reporting.pset_change_log
+FOR EACH ROW EXECUTE FUNCTION reporting.pset_change_log_current_upsert();
+
+-- Same as 004, recreated on the partitioned table
+DROP TRIGGER IF EXISTS pset_change_log_notify ON reporting.pset_change_log;
+CREATE TRIGGER pset_change_log_notify
+AFTER INSERT ON reporting.pset_change_log
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reporting.pset_change_log_notify();
+
+ANALYZE reporting.pset_change_log;
+ANALYZE reporting.pset_change_log_current;
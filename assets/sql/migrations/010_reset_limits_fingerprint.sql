@@ -0,0 +1,14 @@
+-- Clear the baseline's limits fingerprints computed by the first version of
+-- shared/pset_diff.limits_fingerprint.
+--
+-- That version hashed with pandas' hash_pandas_object, whose output pandas
+-- does not promise to keep across releases. The fingerprint is now the
+-- SHA-256 of a canonical text of the limits, so stored values no longer
+-- compare equal. With NULL fingerprints the next import falls back to
+-- comparing time_last_change and refills them as "touch" rows, instead of
+-- logging a revision for every PSET. Deploy together with the new
+-- pset_diff.py. Safe to re-run.
+
+UPDATE reporting.device_pset_baseline
+SET limits_fingerprint = NULL
+WHERE limits_fingerprint IS NOT NULL;
@@ -0,0 +1,16 @@
+-- rev_time index for the app's snapshot delta query.
+--
+-- ChangeLogSnapshot.DELTA_SQL reads rows with createdat >= :hwm OR
+-- rev_time >= :hwm on every refresh and every NOTIFY batch. createdat was
+-- indexed (001, 009) but rev_time was not, so each delta scanned the whole
+-- projection: every partition, since rev_time cannot prune. With both
+-- indexed the planner combines them in a BitmapOr per partition.
+--
+-- pset_change_log_current is partitioned (009), and CONCURRENTLY is not
+-- supported on a partitioned table, so this build blocks writes to the
+-- projection while it runs. Safe to re-run.
+
+CREATE INDEX IF NOT EXISTS pset_change_log_current_rev_time_idx
+    ON reporting.pset_change_log_current (rev_time);
+
+ANALYZE reporting.pset_change_log_current;
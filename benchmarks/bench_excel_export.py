@@ -0,0 +1,76 @@
+"""
+Excel export: shared.downloads.excel_format (openpyxl, cell by cell) vs excel_xlsx.
+
+    python -m benchmarks.bench_excel_export [--memory] [rows ...]
+
+Prints wall time for each writer at 10k, 100k and 500k rows of a change-log
+shaped frame (or the row counts given on the command line). --memory adds a
+second, much slower pass under tracemalloc to report peak memory.
+"""
+import io
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from shared.downloads import excel_format, excel_xlsx
+
+
+def change_log_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    created = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s")
+    return pd.DataFrame({
+        "Log ID": np.arange(rows),
+        "Controller ID": "CTRL-" + pd.Series(rng.integers(0, 500, rows)).astype(str),
+        "Device": "TR2-" + pd.Series(rng.integers(0, 2000, rows)).astype(str),
+        "PSET": pd.Series(rng.integers(1, 50, rows)).astype(str),
+        "Time Last Change": created,
+        "Rev": rng.integers(0, 5, rows),
+        "Revision Time": created.where(rng.random(rows) > 0.7),
+        "User": np.where(rng.random(rows) > 0.7, "engineer", None),
+        "Note": np.where(rng.random(rows) > 0.7, "line parameter push", None),
+        "Registered Time": created,
+        "Torque Min": rng.random(rows) * 10,
+        "Torque Target": rng.random(rows) * 20,
+        "Torque Max": rng.random(rows) * 30,
+        "Angle Min": rng.random(rows) * 90,
+        "Angle Target": rng.random(rows) * 180,
+        "Angle Max": rng.random(rows) * 360,
+    })
+
+
+def measure(writer, df: pd.DataFrame, memory=False) -> tuple[float, float]:
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    workbook = writer(df, "PSET")
+    if hasattr(workbook, "save"):
+        workbook.save(io.BytesIO())
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def main(sizes, memory=False):
+    print(f"{'rows':>8} {'writer':>14} {'seconds':>9} {'peak MiB':>9}")
+    for rows in sizes:
+        df = change_log_frame(rows)
+        # excel_format needs NaT/NaN removed, as the backend used to do
+        legacy_df = df.astype(object).where(df.notna(), None)
+        for name, writer, frame in (("excel_format", excel_format, legacy_df),
+                                    ("excel_xlsx", excel_xlsx, df)):
+            elapsed, _ = measure(writer, frame)
+            peak = measure(writer, frame, memory=True)[1] if memory else float("nan")
+            print(f"{rows:>8} {name:>14} {elapsed:>9.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    memory = "--memory" in args
+    sizes = [int(arg) for arg in args if arg != "--memory"]
+    main(sizes or [10_000, 100_000, 500_000], memory=memory)
@@ -0,0 +1,134 @@
+"""
+Import flow diff: the per-row JSON scripts vs shared.pset_diff.
+
+    python -m benchmarks.bench_pset_diff [rows]
+
+Builds production, controller and baseline inputs shaped like the flow's
+queries (100k production PSETs by default, a third of them changed and a tenth
+new), runs the old add_controller_field + compare_pset loops on JSON and
+pset_diff.diff on frames, checks that both emit the same changes and prints the
+timings. Parquet read time is added when pyarrow is installed.
+"""
+import io
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from shared import pset_diff
+
+
+def inputs(rows: int):
+    rng = np.random.default_rng(0)
+    devices = np.array([f"TR2-{i}" for i in range(rows // 50 + 1)])
+    device = devices[np.arange(rows) // 50]
+    pset = (np.arange(rows) % 50 + 1).astype(str)
+    base_time = pd.Timestamp("2026-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 10 ** 6, rows), unit="s")
+    changed = rng.random(rows) < 0.33
+    change_time = base_time.where(~changed, base_time + pd.Timedelta(hours=1))
+
+    prod = pd.DataFrame({
+        "device_name": device,
+        "pset_id": pset,
+        "change_time": change_time.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        **{col: (rng.random(rows) * 100).round(2).astype(str) for col in pset_diff.LIMIT_COLUMNS},
+    })
+    controllers = pd.DataFrame({
+        "deviceid": np.arange(len(devices)),
+        "devicename": devices,
+        "toolserialnumber": "T" + pd.Series(np.arange(len(devices))).astype(str),
+        "controllerserialnumber": "C" + pd.Series(np.arange(len(devices))).astype(str),
+    })
+    in_base = rng.random(rows) >= 0.1
+    baseline = pd.DataFrame({
+        "device": device[in_base],
+        "pset": pset[in_base],
+        "time_last_change": base_time[in_base].strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+    })
+    return prod, controllers, baseline
+
+
+def legacy_diff(prod_rows, dc_rows, base_rows):
+    """add_controller_field + compare_pset as they ran in the flow."""
+    def norm(v):
+        return None if v is None else str(v).strip()
+
+    dc_map = {norm(d["devicename"]): d for d in dc_rows if d.get("devicename")}
+    enriched = []
+    for p in prod_rows:
+        row = dict(p)
+        match = dc_map.get(norm(p.get("device_name")))
+        row["controller_serial_number"] = match.get("controllerserialnumber") if match else None
+        enriched.append(row)
+
+    def parse_time(v):
+        if v is None:
+            return None
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+        return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+    def norm_key(v):
+        if isinstance(v, str):
+            return " ".join(v.strip().split())
+        return v
+
+    base_map = {(norm_key(b.get("device")), norm_key(b.get("pset"))): b for b in base_rows}
+    new_record, updates = [], []
+    for p in enriched:
+        pset = norm_key(p.get("pset_id"))
+        b = base_map.get((norm_key(p.get("device_name")), pset))
+        if not b:
+            new_record.append({"kind": "new", "device": p.get("device_name"), "pset": pset,
+                               "time_last_change": p.get("change_time")})
+            continue
+        if parse_time(p.get("change_time")) != parse_time(b.get("time_last_change")):
+            updates.append({"kind": "update", "controller_id": p.get("controller_serial_number"),
+                            "device": p.get("device_name"), "pset": pset,
+                            "time_last_change": p.get("change_time"),
+                            **{col: p.get(col) for col in pset_diff.LIMIT_COLUMNS}})
+    return new_record + updates
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(rows: int):
+    prod, controllers, baseline = inputs(rows)
+    payloads = [df.to_json(orient="records") for df in (prod, controllers, baseline)]
+
+    legacy, legacy_s = timed(lambda: legacy_diff(*(json.loads(p) for p in payloads)))
+    changes, diff_s = timed(pset_diff.diff, prod, controllers, baseline)
+
+    # The baseline has no fingerprints yet, so revisions follow time_last_change
+    # as before; "touch" rows only backfill the fingerprint.
+    columns = [c for c in pset_diff.CHANGE_COLUMNS if c != "limits_fingerprint"]
+    logged = changes[changes["kind"] != pset_diff.KIND_TOUCH].reset_index(drop=True)
+    expected = pd.DataFrame(legacy, columns=columns).astype("string").fillna("")
+    actual = logged[columns].astype("string").fillna("")
+    assert expected.equals(actual), "pset_diff and the legacy scripts disagree"
+
+    print(f"rows={rows} " + " ".join(f"{k}={n}" for k, n in changes["kind"].value_counts().items()))
+    print(f"legacy JSON loops   {legacy_s * 1000:9.1f} ms")
+    print(f"pset_diff.diff      {diff_s * 1000:9.1f} ms")
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return
+    buffers = []
+    for df in (prod, controllers, baseline):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        buffers.append(buffer)
+    _, read_s = timed(lambda: [pd.read_parquet(io.BytesIO(b.getvalue())) for b in buffers])
+    print(f"parquet read        {read_s * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,78 @@
+"""
+Revision history modal: per-cell "{:.2f}".format vs float64 + Tabulator formatters.
+
+    python -m benchmarks.bench_rev_history_format [rows]
+
+Builds a revision-history shaped frame (50k rows by default) and times, for the
+old and the new path, preparing the frame, building the modal's Tabulator and
+writing the "Download all revision" CSV. Does not need Postgres.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import panel as pn
+
+from apps.app_PSET_change_log.formatting import (DATETIME_FORMAT, NUMERIC_COLUMNS, datetime_formatters,
+                                                 format_numbers, number_formatters)
+
+
+def history_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    created = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s")
+    df = pd.DataFrame({
+        "log_id": np.arange(rows)[::-1],
+        "time_last_change": created,
+        "rev": rng.integers(0, 20, rows),
+        "user": np.where(rng.random(rows) > 0.7, "engineer", None),
+        "rev_time": created.where(rng.random(rows) > 0.7),
+        "note": np.where(rng.random(rows) > 0.7, "line parameter push", None),
+    })
+    for col in NUMERIC_COLUMNS:
+        df[col] = rng.random(rows) * 100
+    return df
+
+
+def old_prepare(df):
+    df = df.copy()
+    for col in NUMERIC_COLUMNS:
+        df[col] = df[col].map("{:.2f}".format)
+    return df
+
+
+def new_prepare(df):
+    return df.copy()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(rows: int):
+    source = history_frame(rows)
+    formatters = datetime_formatters()
+
+    old, prep_old = timed(old_prepare, source)
+    _, table_old = timed(pn.widgets.Tabulator, old, pagination="local", page_size=50, formatters=formatters)
+    _, csv_old = timed(old.to_csv, index=False, date_format=DATETIME_FORMAT)
+
+    new, prep_new = timed(new_prepare, source)
+    _, table_new = timed(pn.widgets.Tabulator, new, pagination="local", page_size=50,
+                         formatters={**formatters, **number_formatters()})
+    _, csv_new = timed(lambda: format_numbers(new).to_csv(index=False, date_format=DATETIME_FORMAT))
+
+    print(f"rows={rows}")
+    print(f"{'step':>10} {'old ms':>9} {'new ms':>9}")
+    for step, before, after in (("prepare", prep_old, prep_new), ("tabulator", table_old, table_new),
+                                ("csv", csv_old, csv_new)):
+        print(f"{step:>10} {before * 1000:9.1f} {after * 1000:9.1f}")
+    # The old path formatted once for both; the new one only formats for the CSV
+    print(f"{'modal':>10} {(prep_old + table_old) * 1000:9.1f} {(prep_new + table_new) * 1000:9.1f}")
+    print(f"{'download':>10} {(prep_old + csv_old) * 1000:9.1f} {(prep_new + csv_new) * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
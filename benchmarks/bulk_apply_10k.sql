@@ -0,0 +1,114 @@
+-- Import flow apply step for 10k changed PSETs: one transaction per PSET (the
+-- old ForEach) vs staging + set-based UPDATE ... FROM / INSERT ... SELECT.
+--
+--   psql -h localhost -p 5454 -U postgres -d portal -f benchmarks/bulk_apply_10k.sql
+--
+-- Everything is created in pg_temp and dropped with the session. The row-by-row
+-- side runs server-side, so it leaves out the per-item JDBC connection and
+-- round trips the ForEach also paid; real runs gain more than shown here.
+
+\timing on
+
+-- 50k baseline PSETs: 1k devices x 50 psets
+CREATE TEMP TABLE bench_baseline AS
+SELECT
+    'DEV-' || d AS device,
+    p::text AS pset,
+    now() - interval '1 day' AS time_last_change,
+    now() - interval '30 days' AS created_at,
+    now() - interval '1 day' AS update_at
+FROM generate_series(1, 1000) d
+CROSS JOIN generate_series(1, 50) p;
+
+CREATE INDEX ON bench_baseline (device, pset);
+
+CREATE TEMP TABLE bench_change_log (
+    log_id serial PRIMARY KEY,
+    controller_id varchar(50),
+    device varchar(255),
+    pset varchar(20),
+    time_last_change timestamptz,
+    rev int4 NOT NULL DEFAULT 0,
+    createdat timestamptz,
+    torque_min double precision,
+    torque_target double precision,
+    torque_max double precision,
+    angle_min double precision,
+    angle_target double precision,
+    angle_max double precision
+);
+
+-- 10k changed PSETs after a line-wide parameter push
+CREATE TEMP TABLE bench_staging AS
+SELECT
+    'update'::varchar(10) AS kind,
+    'CTRL-' || d AS controller_id,
+    'DEV-' || d AS device,
+    p::text AS pset,
+    now() AS time_last_change,
+    random() * 10 AS torque_min,
+    random() * 20 AS torque_target,
+    random() * 30 AS torque_max,
+    random() * 90 AS angle_min,
+    random() * 180 AS angle_target,
+    random() * 360 AS angle_max
+FROM generate_series(1, 200) d
+CROSS JOIN generate_series(1, 50) p;
+
+ANALYZE bench_baseline;
+ANALYZE bench_staging;
+
+-- Before: UPDATE + INSERT + COMMIT per PSET
+DO $$
+DECLARE
+    s record;
+BEGIN
+    FOR s IN SELECT * FROM bench_staging LOOP
+        UPDATE bench_baseline
+        SET time_last_change = s.time_last_change, update_at = CURRENT_TIMESTAMP
+        WHERE device = s.device AND pset = s.pset;
+
+        INSERT INTO bench_change_log (
+            controller_id, device, pset, time_last_change, rev, createdat,
+            torque_min, torque_target, torque_max, angle_min, angle_target, angle_max
+        )
+        VALUES (
+            s.controller_id, s.device, s.pset, s.time_last_change, 0, CURRENT_TIMESTAMP,
+            s.torque_min, s.torque_target, s.torque_max, s.angle_min, s.angle_target, s.angle_max
+        );
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+TRUNCATE bench_change_log;
+
+-- After: the apply_pset_changes task of Flow/import_new_data.yaml
+BEGIN;
+
+UPDATE bench_baseline b
+SET
+    time_last_change = s.time_last_change,
+    update_at = CURRENT_TIMESTAMP
+FROM bench_staging s
+WHERE s.kind = 'update'
+  AND b.device = s.device
+  AND b.pset = s.pset;
+
+INSERT INTO bench_change_log (
+    controller_id, device, pset, time_last_change, rev, createdat,
+    torque_min, torque_target, torque_max, angle_min, angle_target, angle_max
+)
+SELECT
+    s.controller_id, s.device, s.pset, s.time_last_change, 0, CURRENT_TIMESTAMP,
+    s.torque_min, s.torque_target, s.torque_max, s.angle_min, s.angle_target, s.angle_max
+FROM bench_staging s
+WHERE s.kind = 'update'
+ORDER BY s.device, s.pset;
+
+COMMIT;
+
+-- Loading the staging table itself, as the CopyIn task does
+\copy (SELECT * FROM bench_staging) TO '/tmp/bench_changes.csv' WITH (FORMAT csv, HEADER)
+TRUNCATE bench_staging;
+\copy bench_staging FROM '/tmp/bench_changes.csv' WITH (FORMAT csv, HEADER)
@@ -0,0 +1,47 @@
+-- Planning time of the main change-log query: literal f-string SQL vs the
+-- bound-parameter shape from apps/app_PSET_change_log/queries.py.
+--
+--   psql -h localhost -p 5454 -U postgres -d portal -f benchmarks/change_log_planning.sql
+--
+-- Compare "Planning Time" in the output. The literal queries are planned from
+-- scratch every time; the prepared statement is planned once and, after five
+-- executions (or with plan_cache_mode = force_generic_plan), reuses its plan.
+
+\timing on
+
+-- Before: every device list / date range is a new query text
+EXPLAIN (ANALYZE, SUMMARY, COSTS OFF)
+WITH ranked_logs AS (
+    SELECT l.*, ROW_NUMBER() OVER (PARTITION BY l.log_id ORDER BY l.rev::int DESC) AS rn
+    FROM reporting.pset_change_log l
+)
+SELECT l.* FROM ranked_logs l
+WHERE l.rn = 1
+  AND l."device" IN ('TR2-88', 'TR2-89')
+  AND l.createdat >= '2025-01-01'
+  AND l.createdat <= '2025-12-31'
+ORDER BY l.log_id ASC;
+
+-- After: one statement per filter mode, values bound at execute time
+PREPARE change_log_device_and_date(text[], date, date) AS
+WITH ranked_logs AS (
+    SELECT l.*, ROW_NUMBER() OVER (PARTITION BY l.log_id ORDER BY l.rev::int DESC) AS rn
+    FROM reporting.pset_change_log l
+)
+SELECT l.* FROM ranked_logs l
+WHERE l.rn = 1
+  AND l."device" = ANY($1)
+  AND l.createdat >= $2
+  AND l.createdat <= $3
+ORDER BY l.log_id ASC;
+
+SET plan_cache_mode = force_generic_plan;
+
+EXPLAIN (ANALYZE, SUMMARY, COSTS OFF)
+EXECUTE change_log_device_and_date(ARRAY['TR2-88', 'TR2-89'], '2025-01-01', '2025-12-31');
+
+EXPLAIN (ANALYZE, SUMMARY, COSTS OFF)
+EXECUTE change_log_device_and_date(ARRAY['TR2-90'], '2025-06-01', '2025-06-30');
+
+RESET plan_cache_mode;
+DEALLOCATE change_log_device_and_date;
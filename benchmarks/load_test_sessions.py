@@ -0,0 +1,57 @@
+"""
+Simulate N concurrent browser sessions against the change-log backend.
+
+    python -m benchmarks.load_test_sessions [sessions] [refreshes]
+
+Each simulated session builds its own PSET_change_log_Backend (as a Panel
+session would) and clicks Refresh `refreshes` times, alternating between the
+week filters and "All Time and Device". Needs the configured Postgres.
+Prints per-session latency percentiles and the shared pool stats.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.app_PSET_change_log.PSET_change_log import PSET_change_log_Backend
+from shared.sql import engines
+
+
+async def refresh_loop(backend, refreshes: int) -> list[float]:
+    timings = []
+    for i in range(refreshes):
+        backend.All_Time_Warning_Checkbox.value = i % 2 == 1
+        if i % 2 == 0:
+            backend.Current_Week_Checkbox.value = True
+            backend.Previous_Week_Checkbox.value = True
+        start = time.perf_counter()
+        await backend.refresh_click()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_session(refreshes: int) -> list[float]:
+    # One event loop per simulated session, as Panel gives each server thread
+    return asyncio.run(refresh_loop(PSET_change_log_Backend(), refreshes))
+
+
+def main(sessions: int, refreshes: int):
+    start = time.perf_counter()
+    # Matches pn.serve(num_threads=4) plus headroom for concurrent sessions
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(run_session, [refreshes] * sessions))
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(t for session in results for t in session)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else max(timings)
+    print(f"sessions={sessions} refreshes={refreshes} total={elapsed:.2f}s")
+    print(f"refresh median={statistics.median(timings) * 1000:.1f}ms "
+          f"p95={p95 * 1000:.1f}ms max={max(timings) * 1000:.1f}ms")
+    for key, stat in engines.stats().items():
+        print(key, stat)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 8, args[1] if len(args) > 1 else 5)
@@ -0,0 +1,56 @@
+-- Revision-history query on a 1M-row synthetic change log: varchar rev with
+-- casts vs integer rev with a (log_id, rev) key.
+--
+--   psql -h localhost -p 5454 -U postgres -d portal -f benchmarks/rev_history_1m.sql
+--
+-- Everything is created in pg_temp and dropped with the session.
+
+\timing on
+
+-- 100k logs x 10 revisions, 2k devices x 50 psets
+CREATE TEMP TABLE bench_log_text AS
+SELECT
+    l AS log_id,
+    'DEV-' || (l % 2000) AS device,
+    (l % 50)::text AS pset,
+    r::varchar(20) AS rev,
+    now() - (l || ' minutes')::interval AS createdat
+FROM generate_series(1, 100000) l
+CROSS JOIN generate_series(0, 9) r;
+
+ALTER TABLE bench_log_text ADD PRIMARY KEY (log_id, rev);
+CREATE INDEX ON bench_log_text (device, pset);
+
+CREATE TEMP TABLE bench_log_int AS
+SELECT log_id, device, pset, rev::int4 AS rev, createdat FROM bench_log_text;
+
+ALTER TABLE bench_log_int ADD PRIMARY KEY (log_id, rev);
+CREATE INDEX ON bench_log_int (device, pset);
+
+ANALYZE bench_log_text;
+ANALYZE bench_log_int;
+
+-- fetch_detail_rec_all_rev
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_log_text
+WHERE device = 'DEV-42' AND pset = '42'
+ORDER BY log_id DESC, rev::int DESC;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM bench_log_int
+WHERE device = 'DEV-42' AND pset = '42'
+ORDER BY log_id DESC, rev DESC;
+
+-- edit_rev next revision
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT COALESCE(MAX(rev::int), 0) FROM bench_log_text WHERE log_id = 4242;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT COALESCE(MAX(rev), 0) FROM bench_log_int WHERE log_id = 4242;
+
+-- latest revision per log, whole table
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT DISTINCT ON (log_id) * FROM bench_log_text ORDER BY log_id, rev::int DESC;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT DISTINCT ON (log_id) * FROM bench_log_int ORDER BY log_id, rev DESC;
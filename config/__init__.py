@@ -37,6 +37,10 @@ def db_connection(env: str = 'dev') -> dict:
     except (KeyError, ValueError) as err:
         return conn
 
+def time_zone(env: str = 'dev') -> str:
+    # IANA name of the plant time zone (_TIME_ZONE) for the same env as db_connection
+    return dev._TIME_ZONE if env == 'dev' else prod._TIME_ZONE
+
 class Configuration(param.Parameterized):
     theme = param.String()
     site = param.String(default="TDM Report Portal")
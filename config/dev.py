@@ -9,4 +9,9 @@ _HOST = '127.0.0.1'
 _UID = 'postgres'
 _PWD = 'tKotT9xpeT'
 _PORT = 5454
-_DB = 'portal'
\ No newline at end of file
+_DB = 'portal'
+
+# Time zone of the plant: timestamps are shown in it and the week and date
+# filters start at its midnight. Match the database's SHOW timezone to keep
+# the times the app showed before it converted them itself.
+_TIME_ZONE = 'Asia/Bangkok'
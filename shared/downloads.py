@@ -1,4 +1,14 @@
+import io
+import re
+import tempfile
+import zipfile
+import zlib
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
 import pandas as pd
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name, xl_rowcol_to_cell
 from openpyxl import Workbook
 from openpyxl.worksheet.table import Table, TableStyleInfo
 from openpyxl.styles import Alignment, Font
@@ -36,3 +46,219 @@ def excel_format(data: pd.DataFrame, table_name: str) -> Workbook:
     tab.tableStyleInfo = style
     sheet.add_table(tab)
     return workbook
+
+
+# Same look as excel_format: openpyxl's default datetime format and header font
+EXCEL_DATETIME_FORMAT = 'yyyy-mm-dd h:mm:ss'
+EXCEL_DATETIME_WIDTH = len('yyyy-mm-dd hh:mm:ss')
+EXCEL_TABLE_STYLE = 'Table Style Medium 16'
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+# Parts excel_xlsx patches in the workbook xlsxwriter writes. They follow the
+# output of XlsxWriter 3.2.9, pinned in requirements.txt; check the tests after
+# an upgrade. Anything unexpected raises ExcelTemplateError instead of writing
+# a broken file.
+EXCEL_SHEET = 'xl/worksheets/sheet1.xml'
+EXCEL_TABLE = 'xl/tables/table1.xml'
+EXCEL_CHUNK_ROWS = 20_000
+EXCEL_SPOOL_BYTES = 64 * 2 ** 20
+
+# Style of datetime cells until xlsxwriter has numbered its formats. Quotes
+# in values are escaped, so it cannot occur in the data.
+_DATETIME_STYLE = ' s="datetime"'
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class ExcelTemplateError(Exception):
+    pass
+
+
+def _sub_exact(pattern: str, repl: str, part: str, part_name: str, count: int = 1) -> str:
+    """re.sub that raises ExcelTemplateError unless pattern matches count times."""
+    part, found = re.subn(pattern, repl, part)
+    if found != count:
+        raise ExcelTemplateError(f'{part_name}: expected {count} match(es) of {pattern!r}, found {found}')
+    return part
+
+
+def _xml_text(value: str) -> str:
+    value = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+    return _XML_ILLEGAL.sub('', value) if _XML_ILLEGAL.search(value) else value
+
+
+def _excel_cells(values: pd.Series, refs: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    (<c> elements of one column with cell references refs, '' for blanks;
+    length of its longest value as text). Numbers and datetimes, as Excel
+    serial days, are written as values and everything else as inline strings.
+    Each distinct value is formatted once.
+    """
+    is_datetime = pd.api.types.is_datetime64_any_dtype(values)
+    if is_datetime:
+        if getattr(values.dt, 'tz', None) is not None:
+            values = values.dt.tz_localize(None)
+        values = (values - EXCEL_EPOCH) / pd.Timedelta(days=1)
+    is_number = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+    if is_number and (not pd.api.types.is_integer_dtype(values) or values.hasnans):
+        values = values.astype('float64')
+
+    codes, uniques = pd.factorize(values.to_numpy(dtype=None if is_number else object))
+    text = [value if isinstance(value, str) else str(value) for value in uniques.tolist()]
+    if is_number:
+        blank = ~np.isfinite(np.asarray(uniques, dtype='float64'))
+        start = f'"{_DATETIME_STYLE}><v>' if is_datetime else '"><v>'
+        values, end = np.array(text, dtype=object), '</v></c>'
+    else:
+        blank = np.zeros(len(uniques), dtype=bool)
+        start = '" t="inlineStr"><is><t xml:space="preserve">'
+        values, end = np.array([_xml_text(value) for value in text], dtype=object), '</t></is></c>'
+
+    width = max((len(value) for value, skip in zip(text, blank) if not skip), default=0)
+    if is_datetime and width:
+        width = EXCEL_DATETIME_WIDTH
+
+    # code -1 (missing) picks the trailing blank
+    values = np.append(values, '')
+    blank = np.append(blank, True)
+    cells = '<c r="' + refs + start + values[codes] + end
+    cells[blank[codes]] = ''
+    return cells, width
+
+
+def _excel_rows(data: pd.DataFrame, widths: list) -> Iterator[bytes]:
+    """
+    Sheet <row> elements for data from row 2 on, EXCEL_CHUNK_ROWS rows per
+    chunk. widths is raised to the longest value seen in each column.
+    """
+    columns = [xl_col_to_name(col_idx) for col_idx in range(len(data.columns))]
+    for start in range(0, len(data), EXCEL_CHUNK_ROWS):
+        chunk = data.iloc[start:start + EXCEL_CHUNK_ROWS]
+        rows = np.arange(start + 2, start + 2 + len(chunk)).astype(str).astype(object)
+        xml = '<row r="' + rows + '">'
+        for col_idx, column in enumerate(columns):
+            cells, width = _excel_cells(chunk.iloc[:, col_idx], column + rows)
+            widths[col_idx] = max(widths[col_idx], width)
+            xml = xml + cells
+        yield ''.join((xml + '</row>').tolist()).encode('utf-8')
+
+
+def excel_xlsx(data: pd.DataFrame, table_name: str, output=None):
+    """
+    Same sheet as excel_format (bold centred header, auto-sized columns and a
+    TableStyleMedium16 table) as an .xlsx written into output (a new BytesIO
+    by default), which is returned rewound.
+
+    The data rows are built a column at a time from arrays and spooled to a
+    temporary file, so no writer touches the cells one by one. xlsxwriter then
+    writes the workbook around them (header, widths, table and styles) and the
+    rows are streamed into its sheet; its constant_memory mode, which would
+    still write every cell in Python, cannot hold a table. Raises
+    ExcelTemplateError if xlsxwriter's parts are not laid out as expected.
+    """
+    columns = [str(column) for column in data.columns]
+    is_datetime = [pd.api.types.is_datetime64_any_dtype(data[column]) for column in data.columns]
+    last_row, last_col = max(len(data), 1), max(len(columns), 1) - 1
+    data_range = f'A1:{xl_rowcol_to_cell(last_row, last_col)}'
+
+    widths = [len(column) for column in columns]
+    chunk_sizes = []
+    with tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_BYTES) as rows:
+        for chunk in _excel_rows(data, widths):
+            chunk_sizes.append(rows.write(chunk))
+
+        template = io.BytesIO()
+        workbook = xlsxwriter.Workbook(template, {'in_memory': True})
+        sheet = workbook.add_worksheet()
+        header_format = workbook.add_format({'bold': True, 'font_size': 12, 'font_color': '#FFFFFF',
+                                             'align': 'center', 'valign': 'vcenter'})
+        datetime_format = workbook.add_format({'num_format': EXCEL_DATETIME_FORMAT})
+
+        # Set the column width to auto-size; datetime columns carry the format
+        for col_idx, width in enumerate(widths):
+            sheet.set_column(col_idx, col_idx, width + 4, datetime_format if is_datetime[col_idx] else None)
+
+        # Convert the data range into an Excel table. It is declared over one
+        # row, as xlsxwriter visits every cell of it, and widened below.
+        sheet.add_table(0, 0, 1, last_col, {
+            'name': table_name,
+            'style': EXCEL_TABLE_STYLE,
+            'columns': [{'header': column, 'header_format': header_format} for column in columns],
+        })
+        workbook.close()
+        if any(is_datetime) and datetime_format.xf_index is None:
+            raise ExcelTemplateError('datetime format was not written to the styles')
+        datetime_style = f' s="{datetime_format.xf_index}"'.encode('utf-8')
+
+        output = io.BytesIO() if output is None else output
+        with zipfile.ZipFile(template) as source, \
+                zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as target:
+            missing = {EXCEL_SHEET, EXCEL_TABLE} - set(source.namelist())
+            if missing:
+                raise ExcelTemplateError(f'xlsxwriter did not write {sorted(missing)}')
+            for item in source.infolist():
+                part = source.read(item).decode('utf-8')
+                if item.filename == EXCEL_TABLE:
+                    # The table's ref and its autoFilter's
+                    part = _sub_exact(r' ref="A1:[A-Z]+2"', f' ref="{data_range}"', part, EXCEL_TABLE, count=2)
+                elif item.filename == EXCEL_SHEET:
+                    # Only the header row may be written before the data rows
+                    sheet_data = part.split('</sheetData>')
+                    if len(sheet_data) != 2 or '<row r="2"' in sheet_data[0]:
+                        raise ExcelTemplateError(f'{EXCEL_SHEET}: unexpected <sheetData>')
+                    head, tail = sheet_data
+                    head = _sub_exact(r'<dimension ref="[^"]*"/>', f'<dimension ref="{data_range}"/>',
+                                      head, EXCEL_SHEET)
+                    rows.seek(0)
+                    with target.open(item.filename, 'w', force_zip64=True) as sheet_part:
+                        sheet_part.write(head.encode('utf-8'))
+                        for size in chunk_sizes:
+                            sheet_part.write(rows.read(size).replace(_DATETIME_STYLE.encode('utf-8'),
+                                                                     datetime_style))
+                        sheet_part.write(('</sheetData>' + tail).encode('utf-8'))
+                    continue
+                target.writestr(item, part)
+    output.seek(0)
+    return output
+
+
+CSV_SPOOL_BYTES = 64 * 2 ** 20
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame], prepare: Callable[[pd.DataFrame], pd.DataFrame] = None,
+               gzip: bool = False, **to_csv_kwargs) -> Iterator[bytes]:
+    """
+    Encode DataFrame chunks as one CSV byte stream, header on the first chunk
+    only. prepare is applied to every chunk (e.g. renaming columns); gzip=True
+    compresses the stream incrementally.
+    """
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    header = True
+    for frame in frames:
+        if prepare is not None:
+            frame = prepare(frame)
+        data = frame.to_csv(index=False, header=header, **to_csv_kwargs).encode("utf-8")
+        header = False
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def csv_file(frames: Iterable[pd.DataFrame], prepare: Callable[[pd.DataFrame], pd.DataFrame] = None,
+             gzip: bool = False, **to_csv_kwargs) -> tempfile.SpooledTemporaryFile:
+    """
+    csv_chunks written into a temporary file, returned rewound. FileDownload
+    seeks and reads its file object whole, so the CSV is spooled rather than
+    streamed; it stays in memory up to CSV_SPOOL_BYTES and moves to disk after.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_BYTES)
+    try:
+        for chunk in csv_chunks(frames, prepare, gzip, **to_csv_kwargs):
+            output.write(chunk)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
@@ -0,0 +1,306 @@
+"""
+Schema migration runner for assets/sql/migrations.
+
+    python -m shared.migrations                 apply pending migrations
+    python -m shared.migrations --status        list applied / pending
+    python -m shared.migrations --baseline 7    record 001..007 as applied without running them
+
+Files are named NNN_description.sql and applied in version order. Each applied
+file is recorded in reporting.schema_migrations with the SHA-256 of its text;
+a recorded file whose text has changed stops the run rather than being
+re-applied. Files are written to be idempotent, so --baseline is safe on a
+database that was migrated by hand with psql.
+
+A file is run in one transaction unless it uses CONCURRENTLY, which cannot run
+inside one; such files run statement by statement in autocommit, like psql -f.
+"""
+import argparse
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from .sql import PGSQL
+from .tdm_logging import logger, log_error
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'assets' / 'sql' / 'migrations'
+MIGRATION_FILE = re.compile(r'^(\d{3})_(\w+)\.sql$')
+
+# Serializes runners started at the same time (several app hosts, a deploy job)
+ADVISORY_LOCK_KEY = 0x5e7c4a06
+
+CREATE_HISTORY_SQL = """
+    CREATE TABLE IF NOT EXISTS reporting.schema_migrations (
+        version int4 NOT NULL,
+        name varchar(255) NOT NULL,
+        checksum char(64) NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms int4,
+        CONSTRAINT schema_migrations_pk PRIMARY KEY (version)
+    )
+"""
+
+RECORD_SQL = """
+    INSERT INTO reporting.schema_migrations (version, name, checksum, duration_ms)
+    VALUES (:version, :name, :checksum, :duration_ms)
+"""
+
+pgsql = PGSQL()
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return re.search(r'\bCONCURRENTLY\b', strip_comments(self.sql), re.IGNORECASE) is None
+
+
+def discover(directory=MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for path in sorted(Path(directory).glob('*.sql')):
+        match = MIGRATION_FILE.match(path.name)
+        if match is None:
+            raise MigrationError(f'{path.name} is not named NNN_description.sql')
+        migrations.append(Migration(int(match.group(1)), match.group(2), path, path.read_text(encoding='utf-8')))
+
+    versions = [m.version for m in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise MigrationError(f'Duplicate migration versions: {duplicates}')
+    return migrations
+
+
+# ======================
+# SQL SCRIPT SPLITTING
+# ======================
+_TOKEN = re.compile(r"""
+      (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*.*?\*/)
+    | (?P<quoted>'(?:[^']|'')*'|"(?:[^"]|"")*")
+    | (?P<dollar>\$(?P<tag>[A-Za-z_]\w*)?\$)
+    | (?P<semicolon>;)
+""", re.VERBOSE | re.DOTALL)
+
+
+def _scan(sql: str):
+    """Yield (kind, start, end) for comments, quoted text, dollar bodies and ;"""
+    pos = 0
+    while True:
+        match = _TOKEN.search(sql, pos)
+        if match is None:
+            return
+        kind = match.lastgroup if match.lastgroup != 'tag' else 'dollar'
+        end = match.end()
+        if kind == 'dollar':
+            close = sql.find(match.group(0), end)
+            if close < 0:
+                raise MigrationError(f'Unterminated {match.group(0)} quote')
+            end = close + len(match.group(0))
+        yield kind, match.start(), end
+        pos = end
+
+
+def strip_comments(sql: str) -> str:
+    parts, pos = [], 0
+    for kind, start, end in _scan(sql):
+        if kind in ('line_comment', 'block_comment'):
+            parts.append(sql[pos:start])
+            pos = end
+    parts.append(sql[pos:])
+    return ''.join(parts)
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split a script on top-level semicolons, skipping comments, quotes and $$ bodies."""
+    statements, pos = [], 0
+    for kind, start, end in _scan(sql):
+        if kind == 'semicolon':
+            statements.append(sql[pos:start])
+            pos = end
+    statements.append(sql[pos:])
+    return [s.strip() for s in statements if strip_comments(s).strip()]
+
+
+# ======================
+# RUNNER
+# ======================
+class MigrationRunner:
+    class_str = 'MigrationRunner'
+
+    def __init__(self, directory=MIGRATIONS_DIR, db='PSET'):
+        self.directory = directory
+        self.db = db
+
+    def applied(self, conn) -> dict:
+        conn.execute(text(CREATE_HISTORY_SQL))
+        rows = conn.execute(text('SELECT version, name, checksum FROM reporting.schema_migrations'))
+        return {row.version: row for row in rows}
+
+    def plan(self, conn) -> tuple[list[Migration], list[Migration]]:
+        """Return (applied, pending) migrations; raise if an applied file was edited."""
+        applied = self.applied(conn)
+        done, pending = [], []
+        for migration in discover(self.directory):
+            row = applied.get(migration.version)
+            if row is None:
+                pending.append(migration)
+            elif row.checksum != migration.checksum:
+                raise MigrationError(
+                    f'{migration.path.name} changed after it was applied on {self.db}; '
+                    f'add a new migration instead of editing it')
+            else:
+                done.append(migration)
+        return done, pending
+
+    def run(self, dry_run=False) -> list[Migration]:
+        class_method = f'{self.class_str}.run'
+        with pgsql.engine(self.db).connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+            try:
+                _, pending = self.plan(conn)
+                if not pending:
+                    logger.info(f'| {class_method} | Schema is up to date')
+                for migration in pending:
+                    if dry_run:
+                        logger.info(f'| {class_method} | Pending {migration.path.name}')
+                        continue
+                    self.apply(conn, migration)
+                return pending
+            except Exception as ex:
+                log_error(class_method, type(ex).__name__, str(ex))
+                raise
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+
+    def apply(self, conn, migration: Migration):
+        class_method = f'{self.class_str}.apply'
+        logger.info(f'| {class_method} | Applying {migration.path.name}'
+                    f'{"" if migration.transactional else " (autocommit)"}')
+        start_time = datetime.now()
+
+        # Run through the driver without bind parameters, so % in format()
+        # calls and : in casts reach the server untouched.
+        driver = conn.connection.driver_connection
+        statements = split_statements(migration.sql)
+        if migration.transactional:
+            with driver.transaction():
+                for statement in statements:
+                    driver.execute(statement)
+                self.record(driver, migration, start_time)
+        else:
+            for statement in statements:
+                driver.execute(statement)
+            self.record(driver, migration, start_time)
+
+        logger.info(f'| {class_method} | Applied {migration.path.name}: {datetime.now() - start_time}')
+
+    def record(self, driver, migration: Migration, start_time=None):
+        duration_ms = None if start_time is None else int((datetime.now() - start_time).total_seconds() * 1000)
+        driver.execute(
+            'INSERT INTO reporting.schema_migrations (version, name, checksum, duration_ms) '
+            'VALUES (%s, %s, %s, %s)',
+            (migration.version, migration.name, migration.checksum, duration_ms))
+
+    def baseline(self, up_to: int) -> list[Migration]:
+        """Record migrations up to version up_to as applied without running them."""
+        with pgsql.connect(self.db, begin=True) as conn:
+            _, pending = self.plan(conn)
+            marked = [m for m in pending if m.version <= up_to]
+            for migration in marked:
+                conn.execute(text(RECORD_SQL), {'version': migration.version, 'name': migration.name,
+                                                'checksum': migration.checksum, 'duration_ms': None})
+                logger.info(f'| {self.class_str}.baseline | Marked {migration.path.name} as applied')
+            return marked
+
+    def status(self) -> tuple[list[Migration], list[Migration]]:
+        with pgsql.connect(self.db, begin=True) as conn:
+            return self.plan(conn)
+
+
+# ======================
+# PLAN CHECKS
+# ======================
+# Partition indexes are reported under their own names; map them to the index
+# on the partitioned table so checks name one index, however many partitions.
+PARENT_INDEX_SQL = """
+    SELECT c.relname AS name, COALESCE(p.relname, c.relname) AS parent
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+    LEFT JOIN pg_class p ON p.oid = i.inhparent
+    WHERE c.relname = ANY(:names)
+    AND c.relkind IN ('i', 'I')
+"""
+
+
+def plan_values(plan: dict, key: str) -> set:
+    """Every value of key (e.g. "Index Name") anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    values = {plan[key]} if key in plan else set()
+    for child in plan.get('Plans', []):
+        values |= plan_values(child, key)
+    return values
+
+
+def explain(query: str, params=None, db='PSET') -> tuple[set, set]:
+    """
+    (indexes, relations) the planner uses for query with sequential scans
+    disabled. Indexes of partitions are reported by their parent index.
+
+    Test tables are often too small for an index to win on cost, so this
+    checks that a usable index exists for the query's shape, not which plan
+    production will pick. EXPLAIN does not execute the statement.
+    """
+    with pgsql.connect(db, begin=True) as conn:
+        conn.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = conn.execute(text(f'EXPLAIN (FORMAT JSON) {query.strip().rstrip(";")}'), params or {}).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plan = plan[0]['Plan']
+        indexes = plan_values(plan, 'Index Name')
+        if indexes:
+            parents = conn.execute(text(PARENT_INDEX_SQL), {'names': list(indexes)})
+            indexes = {row.parent for row in parents} | indexes
+    return indexes, plan_values(plan, 'Relation Name')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m shared.migrations', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--dry-run', action='store_true', help='list what would be applied')
+    parser.add_argument('--baseline', type=int, metavar='VERSION',
+                        help='record migrations up to VERSION as applied without running them')
+    parser.add_argument('--db', default='PSET')
+    args = parser.parse_args(argv)
+
+    runner = MigrationRunner(db=args.db)
+    if args.status:
+        done, pending = runner.status()
+        for migration in done:
+            print(f'applied  {migration.path.name}')
+        for migration in pending:
+            print(f'pending  {migration.path.name}')
+    elif args.baseline is not None:
+        runner.baseline(args.baseline)
+    else:
+        runner.run(dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
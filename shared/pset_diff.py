@@ -0,0 +1,209 @@
+"""
+PSET diff for the Kestra import flow (Flow/import_new_data.yaml).
+
+Joins the latest production PSETs with the controller list and the baseline on
+normalized (device, pset) keys and returns the rows to apply, in one vectorized
+pass. Only depends on pandas and numpy so the flow can load it as a namespace
+file without the app's dependencies.
+"""
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# Column order of changes.csv and reporting.pset_import_staging
+CHANGE_COLUMNS = [
+    "kind", "controller_id", "device", "pset", "time_last_change",
+    "torque_min", "torque_target", "torque_max",
+    "angle_min", "angle_target", "angle_max", "limits_fingerprint",
+]
+LIMIT_COLUMNS = ["torque_min", "torque_target", "torque_max", "angle_min", "angle_target", "angle_max"]
+
+# new: insert a baseline row. update: the limits changed, log a revision.
+# touch: only the timestamp (or a missing fingerprint) changed; refresh the
+# baseline without logging a revision.
+KIND_NEW = "new"
+KIND_UPDATE = "update"
+KIND_TOUCH = "touch"
+
+
+def _per_unique(values: pd.Series, func) -> pd.Series:
+    # Device names and psets repeat heavily; transform each distinct value once
+    codes, uniques = pd.factorize(values)
+    mapped = func(pd.Series(uniques, dtype="object").astype("string")).to_numpy()
+    return pd.Series(pd.array(mapped, dtype="string")[codes], index=values.index).where(codes >= 0)
+
+
+def strip(values: pd.Series) -> pd.Series:
+    return _per_unique(values, lambda text: text.str.strip())
+
+
+def normalize_key(values: pd.Series) -> pd.Series:
+    """Strip and collapse inner whitespace, like " ".join(v.strip().split())."""
+    return _per_unique(values, lambda text: text.str.strip().str.replace(r"\s+", " ", regex=True))
+
+
+def parse_times(values: pd.Series) -> pd.Series:
+    """Parse ISO 8601 timestamps to UTC; naive values are taken as UTC."""
+    return pd.to_datetime(values, utc=True, format="ISO8601", errors="coerce")
+
+
+def _to_float(values: pd.Series) -> pd.Series:
+    try:
+        return values.astype("float64")
+    except (TypeError, ValueError):
+        # Blank or malformed text; to_numeric is slower but turns it into NaN
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def _limit_texts(df: pd.DataFrame) -> tuple[list, list]:
+    """Per limit column: (codes, formatted text of each distinct value)."""
+    codes, texts = [], []
+    for col in LIMIT_COLUMNS:
+        values = _to_float(df[col]) if col in df.columns else pd.Series(np.nan, index=df.index)
+        # + 0.0 turns -0.0 into 0.0
+        col_codes, uniques = pd.factorize(values.to_numpy(dtype="float64") + 0.0, use_na_sentinel=True)
+        # NaN gets code -1, which indexes the trailing "" below
+        codes.append(col_codes)
+        texts.append(np.array(["%.6g" % v for v in uniques.tolist()] + [""], dtype=object))
+    return codes, texts
+
+
+def _canonical_rows(codes, texts, rows) -> list:
+    columns = [text[code[rows]] for code, text in zip(codes, texts)]
+    return ["|".join(parts) for parts in zip(*columns)]
+
+
+def canonical_limits(df: pd.DataFrame) -> pd.Series:
+    """
+    The six limit values as one text per row: each value formatted "%.6g"
+    (NULL as an empty field, -0 as 0) and joined with "|" in LIMIT_COLUMNS
+    order, e.g. "1.5|2|2.5||90|180". Numbers are compared as numbers, so
+    "1.5" and "1.50" give the same text.
+    """
+    codes, texts = _limit_texts(df)
+    return pd.Series(_canonical_rows(codes, texts, np.arange(len(df))), index=df.index, dtype="object")
+
+
+def _sha256_int64(texts) -> np.ndarray:
+    """First 8 bytes of each text's SHA-256 as a signed big-endian int64."""
+    digests = b"".join(hashlib.sha256(t.encode("utf-8")).digest()[:8] for t in texts)
+    return np.frombuffer(digests, dtype=">i8").astype(np.int64)
+
+
+def limits_fingerprint(df: pd.DataFrame) -> pd.arrays.StringArray:
+    """
+    Fingerprint of the six limit values per row, stored as int8 in
+    device_pset_baseline.limits_fingerprint: the first 8 bytes of the SHA-256
+    of canonical_limits(), read as a signed big-endian integer. It only
+    depends on that text, so it stays the same across pandas and numpy
+    versions.
+
+    Returned as decimal text: the baseline is read as text too, because a
+    nullable int8 column would otherwise pass through float64 and lose bits.
+    """
+    if len(df) == 0:
+        return pd.array([], dtype="string")
+    codes, texts = _limit_texts(df)
+    # Limit sets repeat across devices; format and hash each distinct set once.
+    # Refactorizing after each column keeps the combined key below rows**2.
+    key = np.zeros(len(df), dtype=np.int64)
+    for col_codes, text in zip(codes, texts):
+        key, _ = pd.factorize(key * len(text) + (col_codes + 1))
+    first = np.unique(key, return_index=True)[1]
+    hashes = _sha256_int64(_canonical_rows(codes, texts, first)).astype(str)
+    return pd.array(hashes[key], dtype="string")
+
+
+def enrich_controller(prod: pd.DataFrame, controllers: pd.DataFrame) -> pd.DataFrame:
+    """Add controller_serial_number to prod by device name (last match wins)."""
+    names = strip(controllers["devicename"])
+    serials = (
+        pd.Series(controllers["controllerserialnumber"].to_numpy(), index=names)
+        .loc[lambda s: s.index.notna() & (s.index != "")]
+    )
+    serials = serials[~serials.index.duplicated(keep="last")]
+    device = strip(prod["device_name"])
+    return prod.assign(controller_serial_number=device.map(serials).to_numpy())
+
+
+def diff(prod: pd.DataFrame, controllers: pd.DataFrame, baseline: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return the changes to apply as a frame with CHANGE_COLUMNS.
+
+    prod has one row per (device, pset) from the EOR scan, controllers is
+    reporting.device_controller and baseline is reporting.device_pset_baseline
+    (limits_fingerprint selected as text).
+    PSETs missing from the baseline are "new". PSETs whose limits fingerprint
+    differs from the baseline's are "update"; a re-stamped timeLastChange with
+    the same limits is only a "touch". Baseline rows without a fingerprint yet
+    fall back to comparing time_last_change.
+
+    Rows without a device name (a deviceId missing from Equipment_Device) or
+    a pset are dropped with a warning: staging requires both, and one bad row
+    would fail every run, because the watermark only moves after a
+    successful apply.
+    """
+    prod = enrich_controller(prod, controllers)
+    prod = prod.assign(
+        _device_key=normalize_key(prod["device_name"]),
+        _pset_key=normalize_key(prod["pset_id"]),
+    )
+    has_key = (prod["_device_key"].fillna("") != "") & (prod["_pset_key"].fillna("") != "")
+    if not has_key.all():
+        dropped = prod.loc[~has_key]
+        sample = dropped[[c for c in ("deviceId", "device_name", "pset_id") if c in dropped.columns]].head(5)
+        log.warning("Skipping %d production rows without a device or pset: %s",
+                    len(dropped), sample.to_dict("records"))
+        prod = prod.loc[has_key]
+    prod = prod.assign(limits_fingerprint=limits_fingerprint(prod))
+
+    base_fingerprint = baseline["limits_fingerprint"] if "limits_fingerprint" in baseline.columns else None
+    base = pd.DataFrame({
+        "_device_key": normalize_key(baseline["device"]),
+        "_pset_key": normalize_key(baseline["pset"]),
+        "_base_time": baseline["time_last_change"].to_numpy(),
+        "_base_fingerprint": pd.array(base_fingerprint if base_fingerprint is not None else [pd.NA] * len(baseline),
+                                      dtype="string"),
+    }).drop_duplicates(["_device_key", "_pset_key"], keep="last")
+
+    merged = prod.merge(base, on=["_device_key", "_pset_key"], how="left", indicator=True)
+    is_new = (merged["_merge"] == "left_only").to_numpy()
+
+    # Identical text is the same instant; only parse the pairs that differ
+    change_raw, base_raw = merged["change_time"], merged["_base_time"]
+    same_time = ((change_raw == base_raw) | (change_raw.isna() & base_raw.isna())).to_numpy(copy=True)
+    check = ~is_new & ~same_time
+    if check.any():
+        change_time = parse_times(change_raw[check])
+        base_time = parse_times(base_raw[check])
+        same_time[check] = ((change_time == base_time) | (change_time.isna() & base_time.isna())).to_numpy()
+
+    known = merged["_base_fingerprint"].notna().to_numpy()
+    same_limits = (merged["_base_fingerprint"] == merged["limits_fingerprint"]).fillna(False).to_numpy()
+    is_update = ~is_new & np.where(known, ~same_limits, ~same_time)
+    is_touch = ~is_new & ~is_update & (~same_time | ~known)
+
+    changes = pd.DataFrame({
+        "kind": np.select([is_new, is_update], [KIND_NEW, KIND_UPDATE], KIND_TOUCH),
+        "controller_id": merged["controller_serial_number"],
+        "device": merged["device_name"],
+        "pset": merged["_pset_key"],
+        "time_last_change": merged["change_time"],
+        **{col: merged[col] if col in merged.columns else None for col in LIMIT_COLUMNS},
+        "limits_fingerprint": merged["limits_fingerprint"],
+    })
+    # New baseline rows only carry the key, time and fingerprint
+    changes.loc[is_new, ["controller_id", *LIMIT_COLUMNS]] = None
+
+    # New rows first, matching the order the flow applied them in
+    return pd.concat([changes[is_new], changes[is_update], changes[is_touch]],
+                     ignore_index=True)[CHANGE_COLUMNS]
+
+
+def write_changes_csv(changes: pd.DataFrame, path) -> None:
+    """Write changes for COPY ... (FORMAT csv, HEADER); NULLs are empty fields."""
+    changes[CHANGE_COLUMNS].to_csv(path, index=False, na_rep="")
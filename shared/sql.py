@@ -1,9 +1,13 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from functools import partial
 from datetime import datetime, timedelta
-from typing import Union
+from typing import Iterator, Union
 
 import pandas as pd
-import psycopg2
-from sqlalchemy.engine import URL
+import psycopg
+from sqlalchemy.engine import URL, Engine
 from sqlalchemy import create_engine
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
@@ -14,6 +18,127 @@ from .tdm_logging import logger, log_error, class_method_name
 
 ENV = 'dev'
 
+# Pool sizing for the shared engines. Panel serves with num_threads=4 and each
+# PGSQL.execute_concurrent_queries call can hold 3 connections at once, so the
+# overflow leaves room for a few concurrent sessions on top of the base pool.
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800
+POOL_PRE_PING = True
+
+# psycopg 3 switches a query to a server-side prepared statement once the same
+# query text has run this many times on a connection, so fixed-shape queries
+# (see apps/app_PSET_change_log/queries.py) reuse their plan across refreshes.
+PREPARE_THRESHOLD = 2
+
+# Worker threads for blocking database calls made from async Panel callbacks.
+# Sized to the pool so a burst of callbacks queues here rather than on the pool.
+IO_WORKERS = POOL_SIZE
+
+
+class EngineRegistry:
+    """
+    Process-wide registry of SQLAlchemy engines keyed by (env, db, dialect).
+
+    Engines are created once on first use and then shared by every caller, so
+    queries reuse pooled connections instead of paying for a new pool, TCP
+    connect and authentication each time.
+    """
+    class_str = 'EngineRegistry'
+
+    def __init__(self, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                 pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+        self._engines = {}
+        self._wait = {}
+        self._lock = threading.Lock()
+
+    def get_engine(self, key: tuple, url: URL, **kwargs) -> Engine:
+        engine = self._engines.get(key)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                options = dict(pool_size=self.pool_size,
+                               max_overflow=self.max_overflow,
+                               pool_timeout=self.pool_timeout,
+                               pool_recycle=self.pool_recycle,
+                               pool_pre_ping=self.pool_pre_ping)
+                options.update(kwargs)
+                engine = create_engine(url, **options)
+                self._engines[key] = engine
+                self._wait[key] = {'count': 0, 'total': 0.0, 'max': 0.0}
+                logger.info(f'| {self.class_str} | Created engine for {key}: {options}')
+            return engine
+
+    @contextmanager
+    def connect(self, key: tuple, engine: Engine, begin: bool = False):
+        # Time spent in engine.connect() is the time waiting on the pool
+        # (plus pre-ping / connect when a new connection has to be opened).
+        start_time = datetime.now()
+        conn = engine.connect()
+        self._record_wait(key, (datetime.now() - start_time).total_seconds())
+        try:
+            if begin:
+                with conn.begin():
+                    yield conn
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    def _record_wait(self, key, seconds):
+        with self._lock:
+            wait = self._wait.setdefault(key, {'count': 0, 'total': 0.0, 'max': 0.0})
+            wait['count'] += 1
+            wait['total'] += seconds
+            wait['max'] = max(wait['max'], seconds)
+
+    def stats(self) -> dict:
+        stats = {}
+        with self._lock:
+            for key, engine in self._engines.items():
+                pool = engine.pool
+                wait = self._wait.get(key, {'count': 0, 'total': 0.0, 'max': 0.0})
+                stats[key] = {
+                    'size': pool.size() if hasattr(pool, 'size') else None,
+                    'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+                    'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+                    'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+                    'checkouts': wait['count'],
+                    'wait_avg': wait['total'] / wait['count'] if wait['count'] else 0.0,
+                    'wait_max': wait['max'],
+                }
+        return stats
+
+    def log_stats(self):
+        for key, stat in self.stats().items():
+            logger.info(f'| {self.class_str} | {key}: {stat}')
+
+
+engines = EngineRegistry()
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='pgsql-io')
+
+
+async def run_async(func, *args, **kwargs):
+    """
+    Run a blocking call on io_executor and await it, so async callbacks never
+    block the Tornado event loop on SQLAlchemy I/O.
+
+    The pooled sync engines are used on purpose: psycopg's native asyncio mode
+    does not run on the Windows ProactorEventLoop the app is developed on.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, partial(func, *args, **kwargs))
+
 
 class PGSQL:
     class_str = 'PGSQL'
@@ -30,7 +155,7 @@ class PGSQL:
             port = self.conn_str['port']
             db = self.conn_str['db']
             url_obj = URL.create(
-                "postgresql",
+                "postgresql+psycopg",
                 username=uid,
                 password=pwd,
                 host=host,
@@ -42,6 +167,36 @@ class PGSQL:
             log_error(class_method, type(err).__name__, str(err))
             raise
 
+    def engine_key(self, db=None) -> tuple:
+        # connect_url always resolves to the configured database, so every db
+        # alias passed by callers shares the same engine.
+        return ENV, self.conn_str['db'], 'postgresql+psycopg'
+
+    def engine(self, db=None) -> Engine:
+        return engines.get_engine(self.engine_key(db), self.connect_url(db),
+                                  connect_args={'prepare_threshold': PREPARE_THRESHOLD})
+
+    def connect(self, db=None, begin=False):
+        return engines.connect(self.engine_key(db), self.engine(db), begin=begin)
+
+    @contextmanager
+    def listen(self, channel, db=None):
+        """
+        Hold one pooled connection in autocommit LISTENing on channel and yield
+        the underlying psycopg connection, whose notifies() receives the events.
+
+        The connection is discarded on exit instead of going back to the pool,
+        so no other caller inherits the subscription.
+        """
+        with self.engine(db).connect() as conn:
+            try:
+                conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                conn.exec_driver_sql(f'LISTEN "{channel}"')
+                logger.info(f'| {self.class_str} | Listening on "{channel}"')
+                yield conn.connection.driver_connection
+            finally:
+                conn.invalidate()
+
     def sql_to_df(self, query, params=None, db='portal1', mod=None) -> Union[pd.Series, pd.DataFrame]:
         class_method = class_method_name() if mod is None else mod
         db = db if db else self.conn_str['db']
@@ -50,8 +205,7 @@ class PGSQL:
         start_time = datetime.now()
 
         try:
-            engine = create_engine(self.connect_url(db), echo=False, echo_pool='debug', pool_size=1, max_overflow=5)
-            with engine.begin() as conn:
+            with self.connect(db, begin=True) as conn:
                 if params:
                     df = pd.read_sql(text(query), conn, params=params)
                 else:
@@ -68,6 +222,37 @@ class PGSQL:
             log_error(class_method, 'Exception', str(ex))
             return pd.DataFrame()
 
+    def stream_df(self, query, params=None, db='portal1', mod=None, chunksize=5000) -> Iterator[pd.DataFrame]:
+        """
+        Yield the result of query in DataFrame chunks of at most chunksize rows.
+
+        Rows are read through a server-side cursor, so memory stays bounded by
+        one chunk regardless of the result size. The pooled connection is held
+        until the generator is exhausted or closed. Errors are logged and
+        re-raised: a stream that ends early must not pass for the whole result.
+        """
+        class_method = class_method_name() if mod is None else mod
+        logger.info(f'| {class_method} | Stream query: "{query}"')
+        logger.info(f'| {class_method} | Params: "{params}"')
+        start_time = datetime.now()
+        rows = 0
+
+        try:
+            with self.connect(db) as conn:
+                conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+                for chunk in pd.read_sql(text(query), conn, params=params or None, chunksize=chunksize):
+                    rows += len(chunk)
+                    yield chunk
+
+            end_time = datetime.now()
+            logger.info(f"| {class_method} | Streamed {rows} rows: {str(end_time - start_time)}")
+        except SQLAlchemyError as err:
+            log_error(class_method, type(err).__name__, f'{err} (after {rows} rows)')
+            raise
+        except Exception as ex:
+            log_error(class_method, 'Exception', f'{ex} (after {rows} rows)')
+            raise
+
     def execute_concurrent_queries(self, query1, param1, query2, param2, query3, param3,
                                    db='portal1') -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         class_method = class_method_name()
@@ -75,16 +260,13 @@ class PGSQL:
             logger.info(f'| {class_method} | Starting concurrent query execution')
             total_start_time = datetime.now()
 
-            # Create a database engine
-            engine = create_engine(self.connect_url(db), echo=False, echo_pool='debug', pool_size=1, max_overflow=5)
-
             # Function to execute query
             def execute_query(query, params=None):
                 logger.info(f'| {self.class_str} | Query: "{query}"')
                 logger.info(f'| {self.class_str} | Params: "{params}"')
                 try:
                     start_time = datetime.now()
-                    with engine.connect() as connection:
+                    with self.connect(db) as connection:
                         if params:
                             result = connection.execute(text(query), params)
                         else:
@@ -95,7 +277,7 @@ class PGSQL:
                         end_time = datetime.now()
                         logger.info(f"| {class_method} | Executed: {str(end_time - start_time)}")
                         return pd.DataFrame(rows, columns=columns)
-                except (SQLAlchemyError, psycopg2.OperationalError) as err:
+                except (SQLAlchemyError, psycopg.OperationalError) as err:
                     log_error(class_method, type(err).__name__, str(err))
                     return pd.DataFrame()
                 except Exception as e:
@@ -137,14 +319,22 @@ class MSSQL:
             log_error(self.str_class, 'KeyError', str(key_err))
             raise
 
+    def engine_key(self, db) -> tuple:
+        return ENV, db, 'mssql+pyodbc'
+
+    def engine(self, db) -> Engine:
+        return engines.get_engine(self.engine_key(db), self.connect_url(db))
+
+    def connect(self, db, begin=False):
+        return engines.connect(self.engine_key(db), self.engine(db), begin=begin)
+
     def sql_to_df(self, query, params=None, db='TDM') -> Union[pd.Series, pd.DataFrame]:
         logger.info(f'| {self.str_class} | Query: "{query}"')
         logger.info(f'| {self.str_class} | Params: "{params}"')
         start_time = datetime.now()
 
         try:
-            engine = create_engine(self.connect_url(db))
-            with engine.begin() as conn:
+            with self.connect(db, begin=True) as conn:
                 if params:
                     df = pd.read_sql_query(text(query), conn, params=params)
                 else:
@@ -165,16 +355,13 @@ class MSSQL:
             logger.info(f'| {self.str_class} | Starting concurrent query execution')
             total_start_time = datetime.now()
 
-            # Create a database engine
-            engine = create_engine(self.connect_url(db), echo=True)
-
             # Function to execute query
             def execute_query(query, params):
                 logger.info(f'| {self.str_class} | Query: "{query}"')
                 logger.info(f'| {self.str_class} | Params: "{params}"')
                 start_time = datetime.now()
                 try:
-                    with engine.connect() as connection:
+                    with self.connect(db) as connection:
                         result = connection.execute(text(query), params)
                         rows = result.fetchall()
                         columns = result.keys()
@@ -184,7 +371,7 @@ class MSSQL:
                 except SQLAlchemyError as sql_err:
                     log_error(f'{self.str_class}', 'SQLAlchemyError', str(sql_err))
                     return pd.DataFrame()
-                except psycopg2.OperationalError as pgsql_err:
+                except psycopg.OperationalError as pgsql_err:
                     log_error(f'{self.str_class}', 'PGSQLError', str(pgsql_err))
                     return pd.DataFrame()
                 except Exception as ex:
@@ -0,0 +1,54 @@
+import datetime
+
+import pandas as pd
+
+from apps.app_PSET_change_log import change_log_cache
+from apps.app_PSET_change_log.change_log_cache import ChangeLogSnapshot
+
+
+def projection(log_ids):
+    return pd.DataFrame({
+        "log_id": log_ids,
+        "device": "TR2-88",
+        "rev": 0,
+        "createdat": pd.to_datetime(["2026-01-01T08:00:00Z"] * len(log_ids), utc=True),
+        "rev_time": pd.to_datetime([None] * len(log_ids), utc=True),
+    })
+
+
+def serve(monkeypatch, rows):
+    """Answer the snapshot's full loads from rows and its deltas with nothing."""
+    queries = []
+
+    def sql_to_df(query, params=None, db=None, mod=None):
+        queries.append(mod)
+        return projection(rows["log_ids"]) if mod == "PSET_snapshot_full" else projection([])
+
+    monkeypatch.setattr(change_log_cache.pgsql, "sql_to_df", sql_to_df)
+    return queries
+
+
+def test_deltas_keep_the_loaded_rows(monkeypatch):
+    rows = {"log_ids": [1, 2, 3]}
+    queries = serve(monkeypatch, rows)
+    snapshot = ChangeLogSnapshot()
+    snapshot.get()
+
+    rows["log_ids"] = [3]
+    snapshot.invalidate()
+
+    assert snapshot.get()["log_id"].tolist() == [1, 2, 3]
+    assert queries == ["PSET_snapshot_full", "PSET_snapshot_delta"]
+
+
+def test_detached_logs_leave_on_the_next_full_load(monkeypatch):
+    rows = {"log_ids": [1, 2, 3]}
+    queries = serve(monkeypatch, rows)
+    snapshot = ChangeLogSnapshot()
+    snapshot.get()
+
+    rows["log_ids"] = [3]
+    snapshot._loaded_at -= change_log_cache.SNAPSHOT_MAX_AGE + datetime.timedelta(seconds=1)
+
+    assert snapshot.get()["log_id"].tolist() == [3]
+    assert queries == ["PSET_snapshot_full", "PSET_snapshot_full"]
@@ -0,0 +1,66 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+import config
+from shared import sql
+from apps.app_PSET_change_log import queries
+from apps.app_PSET_change_log.change_log_cache import ChangeLogSnapshot
+from apps.app_PSET_change_log.formatting import DISPLAY_TIME_ZONE, from_display_timestamp, to_display_time
+
+
+def snapshot_frame(createdat):
+    """Rows as psycopg returns them: timestamptz in the session time zone (UTC here)."""
+    return to_display_time(pd.DataFrame({
+        "log_id": range(len(createdat)),
+        "device": "TR2-88",
+        "createdat": pd.to_datetime(createdat, utc=True),
+    }))
+
+
+def test_display_zone_comes_from_the_env_config():
+    env_config = config.dev if sql.ENV == "dev" else config.prod
+
+    assert DISPLAY_TIME_ZONE == ZoneInfo(env_config._TIME_ZONE)
+
+
+def test_timestamps_are_shown_in_the_display_zone():
+    df = snapshot_frame(["2026-01-01T00:30:00Z"])
+
+    expected = pd.Timestamp("2026-01-01T00:30:00Z").tz_convert(DISPLAY_TIME_ZONE).tz_localize(None)
+    assert df["createdat"].dt.tz is None
+    assert df.loc[0, "createdat"] == expected
+
+
+def test_week_filter_matches_the_sql_bounds():
+    params = queries.filter_params(queries.MODE_CURRENT_WEEK, None, None)
+    week_from, week_to = params["week_from"], params["week_to"]
+    assert week_from.tzinfo is not None and week_from.date() == queries.week_starts()[1]
+
+    second = datetime.timedelta(seconds=1)
+    instants = [week_from - second, week_from, week_to - second, week_to]
+    df = snapshot_frame([instant.astimezone(datetime.timezone.utc) for instant in instants])
+
+    filtered = ChangeLogSnapshot().filter_frame(df, True, False, False, None, None)
+
+    # Same rows as l.createdat >= :week_from AND l.createdat < :week_to
+    assert filtered["log_id"].tolist() == [1, 2]
+
+
+def test_date_filter_starts_at_local_midnight():
+    day = datetime.date(2026, 3, 2)
+    midnight = queries.display_midnight(day)
+    df = snapshot_frame([(midnight - datetime.timedelta(minutes=1)).astimezone(datetime.timezone.utc),
+                         midnight.astimezone(datetime.timezone.utc)])
+
+    filtered = ChangeLogSnapshot().filter_frame(df, False, False, False, None, (day, day + datetime.timedelta(days=1)))
+
+    assert filtered["log_id"].tolist() == [1]
+
+
+def test_high_water_mark_is_bound_as_the_same_instant():
+    instant = pd.Timestamp("2026-01-01T00:30:00Z")
+    df = snapshot_frame([instant])
+
+    assert from_display_timestamp(df.loc[0, "createdat"]) == instant
@@ -0,0 +1,97 @@
+import base64
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from panel.widgets import FileDownload
+
+from shared import downloads
+from shared.downloads import ExcelTemplateError, csv_file, excel_xlsx
+
+
+def frame():
+    return pd.DataFrame({
+        "Log ID": [1, 2, 3],
+        "Device": ["TR2-88", None, "TR2-88"],
+        "Revision Time": pd.to_datetime(["2025-04-07 13:11:20", None, "2025-04-08 08:00:00"]),
+        "Note": ['a & <b> "c"', "tab\x01stripped", None],
+        "Torque Max": [2.5, np.nan, np.inf],
+    })
+
+
+def test_values_keep_their_types_and_blanks():
+    sheet = load_workbook(excel_xlsx(frame(), "PSET")).active
+
+    assert [cell.value for cell in sheet[1]] == ["Log ID", "Device", "Revision Time", "Note", "Torque Max"]
+    assert [cell.value for cell in sheet[2]] == [
+        1, "TR2-88", pd.Timestamp("2025-04-07 13:11:20").to_pydatetime(), 'a & <b> "c"', 2.5]
+    assert [cell.value for cell in sheet[3]] == [2, None, None, "tabstripped", None]
+    assert sheet["E4"].value is None
+    assert sheet["C2"].number_format == "yyyy-mm-dd h:mm:ss"
+
+
+def test_table_spans_the_data_with_the_header_style():
+    sheet = load_workbook(excel_xlsx(frame(), "PSET")).active
+
+    table = sheet.tables["PSET"]
+    assert table.ref == "A1:E4"
+    assert table.tableStyleInfo.name == "TableStyleMedium16"
+    assert sheet.dimensions == "A1:E4"
+    assert sheet["A1"].font.b
+    assert sheet.column_dimensions["D"].width > len('a & <b> "c"')
+
+
+def test_empty_frame_keeps_the_header():
+    sheet = load_workbook(excel_xlsx(frame().iloc[:0], "PSET")).active
+
+    assert [cell.value for cell in sheet[1]] == ["Log ID", "Device", "Revision Time", "Note", "Torque Max"]
+    assert sheet.tables["PSET"].ref == "A1:E2"
+
+
+def test_unexpected_xlsxwriter_output_fails(monkeypatch):
+    monkeypatch.setattr(downloads, "EXCEL_TABLE", "xl/tables/table9.xml")
+    with pytest.raises(ExcelTemplateError):
+        excel_xlsx(frame(), "PSET")
+
+    # The table's two refs are never in the sheet part
+    monkeypatch.setattr(downloads, "EXCEL_TABLE", downloads.EXCEL_SHEET)
+    with pytest.raises(ExcelTemplateError):
+        excel_xlsx(frame(), "PSET")
+
+
+def chunks(df, size):
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def download(fileobj, filename):
+    button = FileDownload(filename=filename, callback=lambda: fileobj)
+    button._transfer()
+    return base64.b64decode(button.data.split(",", 1)[1])
+
+
+def test_csv_file_downloads_through_file_download():
+    df = frame()
+
+    data = download(csv_file(chunks(df, 2), prepare=lambda chunk: chunk.rename(columns=str.upper)), "x.csv")
+
+    assert data.decode("utf-8") == df.rename(columns=str.upper).to_csv(index=False)
+
+
+def test_gzip_csv_file_downloads_through_file_download():
+    df = frame()
+
+    data = download(csv_file(chunks(df, 1), gzip=True), "x.csv.gz")
+
+    assert gzip.decompress(data).decode("utf-8") == df.to_csv(index=False)
+
+
+def test_csv_file_fails_when_the_rows_stop_early():
+    def broken():
+        yield frame()
+        raise ConnectionError("server closed the connection")
+
+    with pytest.raises(ConnectionError):
+        csv_file(broken())
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from apps.app_PSET_change_log.formatting import format_numbers
+
+
+def test_numbers_round_like_the_table():
+    # What (value).toFixed(2) gives in the browser
+    values = [2.675, -0.004, 1.005, 0.125, -0.625, 0.375, 12.0, np.nan]
+    expected = ["2.67", "-0.00", "1.00", "0.13", "-0.63", "0.38", "12.00", ""]
+
+    formatted = format_numbers(pd.DataFrame({"torque_min": values, "note": "x"}))
+
+    assert formatted["torque_min"].tolist() == expected
+    assert formatted["note"].tolist() == ["x"] * len(values)
+
+
+def test_other_decimals_and_text_values():
+    formatted = format_numbers(pd.DataFrame({"angle_max": ["1.25", None, "90"]}), decimals=1)
+
+    assert formatted["angle_max"].tolist() == ["1.3", "", "90.0"]
+
+
+def test_values_beyond_the_exact_range_are_formatted_one_by_one():
+    values = [1e14 + 0.125, -1e14 - 0.375, np.inf, -np.inf, 45035996273.70495]
+
+    formatted = format_numbers(pd.DataFrame({"torque_max": values}))
+
+    assert formatted["torque_max"].tolist() == [
+        "100000000000000.13", "-100000000000000.38", "inf", "-inf", "45035996273.70"]
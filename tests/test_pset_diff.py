@@ -0,0 +1,145 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from shared import pset_diff
+from shared.pset_diff import KIND_NEW, KIND_TOUCH, KIND_UPDATE, LIMIT_COLUMNS
+
+T0 = "2026-01-01T08:00:00+00:00"
+T1 = "2026-01-01T09:00:00+00:00"
+LIMITS = ["1.5", "2", "2.5", "10", "90", "180"]
+
+
+def prod_frame(rows):
+    """rows: (device_name, pset_id, change_time, limits)"""
+    return pd.DataFrame(
+        [(device, pset, time, *limits) for device, pset, time, limits in rows],
+        columns=["device_name", "pset_id", "change_time", *LIMIT_COLUMNS],
+    )
+
+
+def controllers_frame(names=("TR2-88",)):
+    return pd.DataFrame({
+        "devicename": list(names),
+        "controllerserialnumber": [f"C-{name}" for name in names],
+    })
+
+
+def baseline_frame(rows):
+    """rows: (device, pset, time_last_change, limits or None for no fingerprint)"""
+    fingerprints = [
+        None if limits is None else pset_diff.limits_fingerprint(prod_frame([("", "", None, limits)]))[0]
+        for _, _, _, limits in rows
+    ]
+    return pd.DataFrame({
+        "device": [row[0] for row in rows],
+        "pset": [row[1] for row in rows],
+        "time_last_change": [row[2] for row in rows],
+        "limits_fingerprint": pd.array(fingerprints, dtype="string"),
+    })
+
+
+def kinds(changes):
+    return dict(zip(changes["pset"], changes["kind"]))
+
+
+def test_new_update_and_touch():
+    other = ["1.5", "2", "3", "10", "90", "180"]
+    prod = prod_frame([
+        ("TR2-88", "1", T0, LIMITS),  # unchanged
+        ("TR2-88", "2", T1, other),  # limits changed
+        ("TR2-88", "3", T1, LIMITS),  # re-stamped, same limits
+        ("TR2-88", "4", T0, LIMITS),  # not in the baseline
+        ("TR2-88", "5", T1, LIMITS),  # no fingerprint yet, time changed
+        ("TR2-88", "6", T0, LIMITS),  # no fingerprint yet, same time
+    ])
+    baseline = baseline_frame([
+        ("TR2-88", "1", T0, LIMITS),
+        ("TR2-88", "2", T0, LIMITS),
+        ("TR2-88", "3", T0, LIMITS),
+        ("TR2-88", "5", T0, None),
+        ("TR2-88", "6", T0, None),
+    ])
+
+    changes = pset_diff.diff(prod, controllers_frame(), baseline)
+
+    assert kinds(changes) == {"4": KIND_NEW, "2": KIND_UPDATE, "5": KIND_UPDATE, "3": KIND_TOUCH, "6": KIND_TOUCH}
+    assert list(changes["kind"]) == [KIND_NEW, KIND_UPDATE, KIND_UPDATE, KIND_TOUCH, KIND_TOUCH]
+    update = changes.loc[changes["pset"] == "2"].iloc[0]
+    assert update["controller_id"] == "C-TR2-88"
+    assert update["angle_max"] == "180"
+    new = changes.loc[changes["pset"] == "4"].iloc[0]
+    assert pd.isna(new["controller_id"]) and pd.isna(new["torque_min"])
+
+
+def test_same_instant_in_another_offset_is_not_a_change():
+    prod = prod_frame([("TR2-88", "1", "2026-01-01T15:00:00+07:00", LIMITS)])
+    baseline = baseline_frame([("TR2-88", "1", T0, LIMITS)])
+
+    assert pset_diff.diff(prod, controllers_frame(), baseline).empty
+
+
+def test_keys_match_after_whitespace_normalization():
+    prod = prod_frame([
+        ("  TR2   88 ", " 7 ", T0, LIMITS),
+        ("TR2-88", "1\t", T1, LIMITS),
+    ])
+    baseline = baseline_frame([
+        ("TR2 88", "7", T0, LIMITS),
+        (" TR2-88", "1", T0, LIMITS),
+    ])
+
+    changes = pset_diff.diff(prod, controllers_frame(), baseline)
+
+    assert kinds(changes) == {"1": KIND_TOUCH}
+    assert changes["controller_id"].tolist() == ["C-TR2-88"]
+
+
+def test_rows_without_device_or_pset_are_dropped(caplog):
+    prod = prod_frame([
+        (None, "1", T0, LIMITS),
+        ("TR2-88", None, T0, LIMITS),
+        ("  ", "2", T0, LIMITS),
+        ("TR2-88", "3", T0, LIMITS),
+    ])
+
+    with caplog.at_level(logging.WARNING, logger=pset_diff.__name__):
+        changes = pset_diff.diff(prod, controllers_frame(), baseline_frame([]))
+
+    assert changes["device"].tolist() == ["TR2-88"]
+    assert changes["pset"].tolist() == ["3"]
+    assert "Skipping 3 production rows" in caplog.text
+
+
+def test_null_limits():
+    with_null = [None, "2", "2.5", "10", np.nan, "180"]
+    with_zero = ["0", "2", "2.5", "10", "0", "180"]
+    prod = prod_frame([
+        ("TR2-88", "1", T1, with_null),
+        ("TR2-88", "2", T1, with_zero),
+    ])
+    baseline = baseline_frame([
+        ("TR2-88", "1", T0, with_null),
+        ("TR2-88", "2", T0, with_null),
+    ])
+
+    assert pset_diff.canonical_limits(prod).tolist() == ["|2|2.5|10||180", "0|2|2.5|10|0|180"]
+    # NULL is not 0: only the second PSET's limits changed
+    assert kinds(pset_diff.diff(prod, controllers_frame(), baseline)) == {"1": KIND_TOUCH, "2": KIND_UPDATE}
+
+
+def test_fingerprint_compares_limits_as_numbers():
+    prod = prod_frame([
+        ("TR2-88", "1", T0, ["1.5", "2", "2.5", "10", "90", "180"]),
+        ("TR2-88", "2", T0, ["1.50", "2.0", "2.500", "1e1", "90.00", "180"]),
+        ("TR2-88", "3", T0, ["-0", "2", "2.5", "10", "90", "180"]),
+        ("TR2-88", "4", T0, ["0", "2", "2.5", "10", "90", "180"]),
+    ])
+
+    fingerprints = pset_diff.limits_fingerprint(prod)
+
+    assert fingerprints[0] == fingerprints[1]
+    assert fingerprints[2] == fingerprints[3]
+    assert fingerprints[0] != fingerprints[2]
+    assert pset_diff.canonical_limits(prod)[1] == "1.5|2|2.5|10|90|180"
@@ -0,0 +1,67 @@
+import asyncio
+
+from apps.app_PSET_change_log.refresh import RefreshScheduler
+
+
+class FakeBackend:
+    """Mimics refresh_click: a run whose seq was superseded drops its rows."""
+
+    def __init__(self, durations):
+        self.durations = durations
+        self.filters = None
+        self.seq = 0
+        self.runs = []
+        self.shown = None
+
+    def resolve(self):
+        return "SELECT", {"filters": self.filters}
+
+    async def run(self):
+        self.seq += 1
+        seq, filters = self.seq, self.filters
+        self.runs.append(filters)
+        await asyncio.sleep(self.durations[filters])
+        if seq != self.seq:
+            return False
+        self.shown = filters
+        return True
+
+
+def scheduler_for(backend):
+    return RefreshScheduler(resolve=backend.resolve, run=backend.run, delay=0)
+
+
+def test_superseded_run_does_not_count_as_last_query():
+    async def scenario():
+        backend = FakeBackend({"A": 0.05, "B": 0.1})
+        scheduler = scheduler_for(backend)
+
+        backend.filters = "A"
+        first = asyncio.create_task(scheduler.request())
+        await asyncio.sleep(0.01)
+        backend.filters = "B"
+        second = asyncio.create_task(scheduler.request())
+        # A lands superseded while B is still loading, then the user goes back to A
+        await asyncio.sleep(0.06)
+        backend.filters = "A"
+        third = asyncio.create_task(scheduler.request())
+        await asyncio.gather(first, second, third)
+        return backend
+
+    backend = asyncio.run(scenario())
+    assert backend.runs == ["A", "B", "A"]
+    assert backend.shown == "A"
+
+
+def test_unchanged_filters_skip_after_an_applied_run():
+    async def scenario():
+        backend = FakeBackend({"A": 0.01})
+        scheduler = scheduler_for(backend)
+        backend.filters = "A"
+        await scheduler.request()
+        await scheduler.request()
+        await scheduler.request(force=True)
+        return backend
+
+    backend = asyncio.run(scenario())
+    assert backend.runs == ["A", "A"]